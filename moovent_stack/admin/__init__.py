@@ -48,7 +48,7 @@ from .git_ops import GitCache
 from .github import github_config, GitHubState
 from .updates import UpdateState
 from .server import build_admin_server
-from .deps import read_dotenv, ensure_node_deps, ensure_python_deps
+from .deps import read_dotenv, ensure_all_deps, ensure_node_deps, ensure_python_deps
 from .watchdog import ServiceWatchdog, WatchRule
 
 
@@ -113,8 +113,12 @@ def main(workspace: Path | None = None) -> int:
     else:
         print(f"[runner] Repo not installed: dashboard", flush=True)
 
-    # Check for npm (only required if we have repos with node deps)
-    if (has_mqtt or has_dashboard) and which("npm") is None:
+    # Check for npm (only required if we have repos with node deps).
+    # Resolved once: services are spawned with the absolute path so restarts
+    # don't walk PATH again.
+    npm_path = which("npm")
+    npm_cmd = npm_path or "npm"
+    if (has_mqtt or has_dashboard) and npm_path is None:
         print("[runner] npm not found in PATH", file=sys.stderr)
         return 2
 
@@ -143,14 +147,15 @@ def main(workspace: Path | None = None) -> int:
         update_state.auto_pull_on_launch()
 
     # Install dependencies for available repos
-    py_cmd = sys.executable  # Default fallback
+    node_projects: list[Path] = []
+    if has_mqtt:
+        node_projects.append(mqtt_repo / "mqtt-admin-dashboard")
+    if has_dashboard:
+        node_projects.extend([dashboard_repo / "server", dashboard_repo / "client"])
     try:
-        if has_mqtt:
-            py_cmd = ensure_python_deps(mqtt_repo, sys.executable)
-            ensure_node_deps(mqtt_repo / "mqtt-admin-dashboard")
-        if has_dashboard:
-            ensure_node_deps(dashboard_repo / "server")
-            ensure_node_deps(dashboard_repo / "client")
+        py_cmd = ensure_all_deps(
+            node_projects, mqtt_repo if has_mqtt else None, sys.executable
+        )
     except subprocess.CalledProcessError as e:
         print(f"[runner] Dependency install failed: {e}", file=sys.stderr)
         return 1
@@ -252,7 +257,7 @@ def main(workspace: Path | None = None) -> int:
         manager.register(
             ServiceSpec(
                 name="mqtt-frontend",
-                cmd=["npm", "run", "dev", "--", "--port", "3000", "--strictPort"],
+                cmd=[npm_cmd, "run", "dev", "--", "--port", "3000", "--strictPort"],
                 cwd=mqtt_repo / "mqtt-admin-dashboard",
                 env=dict(os.environ),
                 url="http://localhost:3000",
@@ -266,7 +271,7 @@ def main(workspace: Path | None = None) -> int:
         manager.register(
             ServiceSpec(
                 name="dashboard-server",
-                cmd=["npm", "run", "dev"],
+                cmd=[npm_cmd, "run", "dev"],
                 cwd=dashboard_repo / "server",
                 env=server_env,
                 url=f"http://localhost:{server_port}",
@@ -279,7 +284,7 @@ def main(workspace: Path | None = None) -> int:
         manager.register(
             ServiceSpec(
                 name="dashboard-client",
-                cmd=["npm", "run", "dev", "--", "--port", "4000", "--strictPort"],
+                cmd=[npm_cmd, "run", "dev", "--", "--port", "4000", "--strictPort"],
                 cwd=dashboard_repo / "client",
                 env=client_env,
                 url="http://localhost:4000",
@@ -423,13 +428,11 @@ def main(workspace: Path | None = None) -> int:
                             f"[runner] watchdog failed: {type(exc).__name__}: {exc}",
                         )
 
-            # Record unexpected process exits without killing the stack
-            for name, proc in list(manager.procs.items()):
-                code = proc.poll()
-                if code is not None and manager.desired_running.get(name, False):
-                    manager.note_exit(name, code)
-
-            time.sleep(0.6)
+            # Unexpected process exits are recorded by each service's waiter
+            # thread (StackManager._wait_proc) as soon as the child exits, so
+            # this loop only ticks for the watchdog. Without one there is nothing
+            # to poll: just wait for Ctrl+C (sleep stays signal-interruptible).
+            time.sleep(0.6 if watchdog else 3600)
 
     except KeyboardInterrupt:
         print("\n[runner] Ctrl+C received. Shutting down...", flush=True)
@@ -78,6 +78,21 @@ UPDATE_ENV_ENABLED = "MOOVENT_AUTOUPDATE_ENABLED"
 UPDATE_ENV_CHECK_INTERVAL = "MOOVENT_AUTOUPDATE_CHECK_INTERVAL_S"
 UPDATE_ENV_AUTO_PULL = "MOOVENT_AUTOUPDATE_AUTOPULL"
 
+# ---------------------------------------------------------------------------
+# Dependency cache env vars
+# ---------------------------------------------------------------------------
+NODE_MODULES_CACHE_ENV_ENABLED = "MOOVENT_NODE_MODULES_CACHE"
+NODE_MODULES_CACHE_KEEP = 4  # Most recently used lockfile variants kept on disk.
+
+# ---------------------------------------------------------------------------
+# File change detection
+# ---------------------------------------------------------------------------
+# mtimes have coarse granularity on some filesystems/kernels (up to 1-2 s), so
+# a change in the same tick as a stat leaves the mtime unchanged. Anything
+# modified this recently is not trusted by stat-based skips (deps markers,
+# watchdog directory rescans).
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
 
 # ---------------------------------------------------------------------------
 # Helper functions
@@ -128,6 +143,20 @@ def update_check_interval_s() -> float:
     return max(UPDATE_MIN_CHECK_INTERVAL_S, value)
 
 
+def node_modules_cache_dir() -> Optional[Path]:
+    """
+    Return the `node_modules` cache root, or None when disabled (default).
+
+    Opt in with `MOOVENT_NODE_MODULES_CACHE=1`. Lives under `$XDG_CACHE_HOME`
+    (default `~/.cache`). Restored trees share inodes with the cache, so an
+    in-place edit under `node_modules` also changes the cached copy.
+    """
+    if not env_bool(os.environ.get(NODE_MODULES_CACHE_ENV_ENABLED)):
+        return None
+    base = os.environ.get("XDG_CACHE_HOME", "").strip() or str(Path.home() / ".cache")
+    return Path(base) / "moovent-stack" / "node_modules"
+
+
 def remote_mode_enabled() -> bool:
     """Check if remote-only mode is enabled."""
     return env_bool(os.environ.get(REMOTE_ENV_ENABLED))
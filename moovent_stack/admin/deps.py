@@ -8,11 +8,25 @@ Purpose:
 from __future__ import annotations
 
 import hashlib
+import functools
+import json
 import os
+import platform
+import shutil
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
+
+from ..storage import _atomic_write
+from .config import NODE_MODULES_CACHE_KEEP, RACY_MTIME_WINDOW_NS, node_modules_cache_dir
+
+try:  # Optional (`pip install moovent-stack[fast]`): SIMD hashing for big lockfiles.
+    from blake3 import blake3 as _blake3
+except ImportError:  # pragma: no cover - depends on the environment
+    _blake3 = None
 
 
 def read_dotenv(path: Path) -> dict[str, str]:
@@ -21,11 +35,10 @@ def read_dotenv(path: Path) -> dict[str, str]:
     - Ignores comments + blank lines
     - Supports KEY=VALUE (optionally quoted)
     - Does NOT expand variables
+    - Missing file -> {} (the read doubles as the existence check)
     """
     out: dict[str, str] = {}
     try:
-        if not path.exists():
-            return out
         for raw in path.read_text(encoding="utf-8", errors="ignore").splitlines():
             line = raw.strip()
             if not line or line.startswith("#"):
@@ -47,50 +60,161 @@ def run_cmd(cmd: list[str], *, cwd: Path, env: Optional[dict[str, str]] = None)
     subprocess.check_call(cmd, cwd=str(cwd), env=env or os.environ)
 
 
+def _hash_file(path: Path, new_hash: Callable[[], Any]) -> Optional[Any]:
+    """Hash a file without materializing it as one bytes object; None when unreadable."""
+    try:
+        with open(path, "rb") as f:
+            if hasattr(hashlib, "file_digest"):
+                # Python 3.11+: C loop over a reusable buffer, no per-chunk bytes.
+                return hashlib.file_digest(f, new_hash)
+            h = new_hash()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            return h
+    except Exception:
+        return None
+
+
 def _file_sha256(path: Path) -> str:
     """Return SHA256 for a file, or empty string when unavailable."""
+    h = _hash_file(path, hashlib.sha256)
+    return h.hexdigest() if h is not None else ""
+
+
+def _file_fingerprint(path: Path) -> str:
+    """
+    Return a content fingerprint for a dependency file ("" when unavailable).
+
+    Uses BLAKE3 (128-bit, 32 hex chars) when the optional `blake3` package is
+    installed, SHA256 (64 hex chars) otherwise. The two never compare equal, so
+    switching hashers just reads as "changed" once and reinstalls.
+    """
+    if _blake3 is None:
+        return _file_sha256(path)
+    h = _hash_file(path, _blake3)
+    return h.hexdigest(16) if h is not None else ""
+
+
+def _lock_canonical_hash(path: Path) -> str:
+    """
+    Fingerprint a JSON dependency file by content, not formatting.
+
+    The parsed document is re-serialized with sorted keys and no whitespace
+    before hashing, so an editor reformatting the lockfile (indentation, line
+    endings, key order) does not trigger `npm ci`. Falls back to the raw-bytes
+    fingerprint when the file is not valid JSON.
+    """
     try:
-        data = path.read_bytes()
+        with open(path, "rb") as f:
+            doc = json.load(f)
+    except ValueError:
+        return _file_fingerprint(path)
     except Exception:
         return ""
-    return hashlib.sha256(data).hexdigest()
+    data = json.dumps(doc, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    if _blake3 is None:
+        return hashlib.sha256(data).hexdigest()
+    return _blake3(data).hexdigest(16)
+
+
+# Marker contents keyed by path -> ((mtime_ns, size), value). Re-entrant
+# checks in one process (watchdog reinstalls) cost a stat instead of a read;
+# an external edit or deletion changes the stat and is picked up.
+_marker_cache: dict[str, tuple[tuple[int, int], str]] = {}
 
 
 def _read_marker(marker: Path) -> str:
     """Read a dependency fingerprint marker file."""
+    key = str(marker)
     try:
-        return marker.read_text(encoding="utf-8", errors="ignore").strip()
+        st = os.stat(marker)
+        cached = _marker_cache.get(key)
+        if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
+        value = marker.read_text(encoding="utf-8", errors="ignore").strip()
     except Exception:
+        _marker_cache.pop(key, None)
         return ""
+    _marker_cache[key] = ((st.st_mtime_ns, st.st_size), value)
+    return value
 
 
 def _write_marker(marker: Path, value: str) -> None:
-    """Write a dependency fingerprint marker file."""
+    """Write a dependency fingerprint marker file (atomically: never torn)."""
+    key = str(marker)
     try:
-        marker.write_text(f"{value}\n", encoding="utf-8")
+        _atomic_write(marker, f"{value}\n".encode("utf-8"))
+        st = os.stat(marker)
+        _marker_cache[key] = ((st.st_mtime_ns, st.st_size), value)
     except Exception:
-        pass
+        _marker_cache.pop(key, None)
+
 
+def _stat_fingerprint(
+    kind: str,
+    path: Path,
+    st: os.stat_result,
+    previous: str,
+    digest_fn: Optional[Callable[[Path], str]] = None,
+) -> str:
+    """
+    Build a `<kind>:<mtime_ns>:<size>:<digest>` marker for `path`.
+
+    When `previous` was recorded for the same (mtime_ns, size), its digest is
+    reused and the file is not hashed at all (steady-state startup).
+    `digest_fn` defaults to `_file_fingerprint`.
+    """
+    prefix = f"{kind}:{st.st_mtime_ns}:{st.st_size}:"
+    if previous.startswith(prefix):
+        return previous
+    digest = (digest_fn or _file_fingerprint)(path)
+    if time.time_ns() - st.st_mtime_ns < RACY_MTIME_WINDOW_NS:
+        # Too fresh to trust the stat later: record the digest only.
+        return f"{kind}:{digest}"
+    return prefix + digest
+
+
+def _same_fingerprint(a: str, b: str) -> bool:
+    """
+    Compare markers by kind + content digest, ignoring the stat fields.
 
-def _node_dep_fingerprint(project_dir: Path) -> str:
+    Also matches the legacy `<kind>:<digest>` form, so older markers upgrade
+    in place instead of forcing a reinstall.
+    """
+    a_kind, _, a_rest = a.partition(":")
+    b_kind, _, b_rest = b.partition(":")
+    return a_kind == b_kind and a_rest.rpartition(":")[2] == b_rest.rpartition(":")[2]
+
+
+def _node_dep_fingerprint(project_dir: Path, previous: str = "") -> str:
     """
     Build a node dependency fingerprint.
 
     Priority:
     - package-lock.json (most accurate for npm installs)
     - package.json fallback
+
+    Both are hashed as canonical JSON (see `_lock_canonical_hash`).
     """
     lock = project_dir / "package-lock.json"
-    if lock.exists():
-        return f"lock:{_file_sha256(lock)}"
+    try:
+        return _stat_fingerprint("lock", lock, os.stat(lock), previous, _lock_canonical_hash)
+    except FileNotFoundError:
+        pass
     pkg = project_dir / "package.json"
-    return f"pkg:{_file_sha256(pkg)}"
+    try:
+        return _stat_fingerprint("pkg", pkg, os.stat(pkg), previous, _lock_canonical_hash)
+    except OSError:
+        return "pkg:"
 
 
-def _python_dep_fingerprint(mqtt_repo: Path) -> str:
+def _python_dep_fingerprint(mqtt_repo: Path, previous: str = "") -> str:
     """Build a python dependency fingerprint from requirements.txt."""
     req = mqtt_repo / "requirements.txt"
-    return f"req:{_file_sha256(req)}"
+    try:
+        return _stat_fingerprint("req", req, os.stat(req), previous)
+    except OSError:
+        return "req:"
 
 
 def _vite_is_healthy(node_modules: Path) -> bool:
@@ -106,9 +230,7 @@ def _vite_is_healthy(node_modules: Path) -> bool:
     cli = node_modules / "vite" / "dist" / "node" / "cli.js"
     chunks_dir = node_modules / "vite" / "dist" / "node" / "chunks"
     
-    if not cli.exists() or not chunks_dir.exists():
-        return False
-    
+    # Reading cli.js doubles as its existence check (missing -> unhealthy).
     try:
         text = cli.read_text(encoding="utf-8", errors="replace")
     except Exception:
@@ -118,7 +240,7 @@ def _vite_is_healthy(node_modules: Path) -> bool:
     refs = re.findall(r"""['"]\./chunks/(dep-[^'"]+\.js)['"]""", text)
     if not refs:
         # Unexpected format; assume ok if files exist
-        return True
+        return chunks_dir.is_dir()
     
     for ref in set(refs):
         if not (chunks_dir / ref).exists():
@@ -126,48 +248,179 @@ def _vite_is_healthy(node_modules: Path) -> bool:
     return True
 
 
-def ensure_node_deps(project_dir: Path) -> None:
+def _marker_fingerprints(
+    marker: Path, build: Callable[[str], str]
+) -> tuple[str, str]:
+    """Return `(current_fp, expected_fp)` for a marker and its fingerprint builder."""
+    current_fp = _read_marker(marker)
+    return current_fp, build(current_fp)
+
+
+# Written into node_modules at runtime (vite optimizer, babel/eslint caches).
+# Never shared with the cache: hard-linked files would be modified in place.
+_NODE_MODULES_CACHE_SKIP = (".vite", ".cache")
+
+
+@functools.lru_cache(maxsize=1)
+def _node_abi() -> str:
+    """Node's native-module ABI (`process.versions.modules`), "" when unknown."""
+    try:
+        result = subprocess.run(
+            ["node", "-p", "process.versions.modules"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except Exception:
+        return ""
+    return result.stdout.strip() if result.returncode == 0 else ""
+
+
+def _node_modules_cache_entry(project_dir: Path, fingerprint: str) -> Optional[Path]:
+    """
+    Return the cache directory for a lockfile fingerprint, or None if unusable.
+
+    Keyed by lockfile digest + machine + Node ABI, so native addons are never
+    reused across Node majors. Entries are hard-linked trees, so the cache must
+    live on the same filesystem as the project.
+    """
+    root = node_modules_cache_dir()
+    digest = fingerprint.rpartition(":")[2]
+    if root is None or not digest:
+        return None
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        if os.stat(root).st_dev != os.stat(project_dir).st_dev:
+            return None
+    except OSError:
+        return None
+    return root / f"{digest}-{platform.machine()}-abi{_node_abi() or 'unknown'}"
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Clone `src` to `dst` with hard links (no file data is copied)."""
+    shutil.copytree(
+        src,
+        dst,
+        symlinks=True,
+        copy_function=os.link,
+        ignore=shutil.ignore_patterns(*_NODE_MODULES_CACHE_SKIP),
+    )
+
+
+def _restore_node_modules(entry: Path, node_modules: Path) -> bool:
+    """Replace `node_modules` with a hard-linked clone of a cache entry."""
+    if not entry.is_dir():
+        return False
+    tmp = node_modules.with_name(f".node_modules.restore-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        _link_tree(entry, tmp)
+        shutil.rmtree(node_modules, ignore_errors=True)
+        os.replace(tmp, node_modules)
+        os.utime(entry)  # Mark as recently used for pruning.
+        return True
+    except (OSError, shutil.Error):
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+
+
+def _store_node_modules(node_modules: Path, entry: Path) -> None:
+    """Best-effort: add a fresh install to the cache and prune old entries."""
+    if entry.exists() or not node_modules.is_dir():
+        return
+    tmp = entry.with_name(f"{entry.name}.tmp-{os.getpid()}")
+    try:
+        _link_tree(node_modules, tmp)
+        os.replace(tmp, entry)
+    except (OSError, shutil.Error):
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    try:
+        entries = [p for p in entry.parent.iterdir() if p.is_dir() and ".tmp-" not in p.name]
+        entries.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for stale in entries[NODE_MODULES_CACHE_KEEP:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def ensure_node_deps(
+    project_dir: Path, *, fingerprints: Optional[tuple[str, str]] = None
+) -> None:
     """
     Ensure `npm install` has been run for a Node project.
     
     Also detects and repairs corrupted Vite installations.
+    `fingerprints` is a precomputed `(current_fp, expected_fp)` (see ensure_all_deps).
+
+    Lockfile installs are cached per lockfile fingerprint (see
+    `_node_modules_cache_entry`): switching back to a lockfile seen before
+    hard-links the cached tree into place instead of running `npm ci`.
     """
-    import shutil
-    
     if not (project_dir / "package.json").exists():
         raise FileNotFoundError(f"Missing package.json in {project_dir}")
     
     node_modules = project_dir / "node_modules"
     marker = project_dir / ".deps_installed"
-    expected_fp = _node_dep_fingerprint(project_dir)
-    current_fp = _read_marker(marker)
+    current_fp, expected_fp = fingerprints or _marker_fingerprints(
+        marker, lambda prev: _node_dep_fingerprint(project_dir, prev)
+    )
     
     # Check if node_modules exists and Vite is healthy
+    corrupted = False
     needs_install = not node_modules.exists()
-    if not needs_install and expected_fp and current_fp != expected_fp:
+    if not needs_install and expected_fp and not _same_fingerprint(current_fp, expected_fp):
         print(f"[runner] Node deps changed in {project_dir}, reinstalling...", flush=True)
         needs_install = True
     if not needs_install and (node_modules / "vite").exists():
         if not _vite_is_healthy(node_modules):
             print(f"[runner] Corrupted Vite detected in {project_dir}, reinstalling...", flush=True)
             shutil.rmtree(node_modules, ignore_errors=True)
-            needs_install = True
+            corrupted = needs_install = True
     
     if needs_install:
-        print(f"[runner] Installing npm deps in {project_dir} ...", flush=True)
-        lock = project_dir / "package-lock.json"
-        mode = "ci" if lock.exists() else "install"
-        run_cmd(["npm", mode, "--no-audit", "--no-fund"], cwd=project_dir)
+        # The fingerprint already records whether package-lock.json exists.
+        mode = "ci" if expected_fp.startswith("lock:") else "install"
+        # `npm install` without a lockfile isn't reproducible, so only `ci` is cached.
+        entry = _node_modules_cache_entry(project_dir, expected_fp) if mode == "ci" else None
+        restored = False
+        if entry is not None:
+            if corrupted:
+                # A restored tree shares inodes with its cache entry, so the entry
+                # is most likely broken too: drop it and reinstall from scratch.
+                shutil.rmtree(entry, ignore_errors=True)
+            elif _restore_node_modules(entry, node_modules):
+                restored = not (node_modules / "vite").exists() or _vite_is_healthy(node_modules)
+                if not restored:
+                    print(f"[runner] Cached npm deps for {project_dir} are corrupted, evicting", flush=True)
+                    shutil.rmtree(node_modules, ignore_errors=True)
+                    shutil.rmtree(entry, ignore_errors=True)
+        if restored:
+            print(f"[runner] Restored npm deps in {project_dir} from cache", flush=True)
+        else:
+            print(f"[runner] Installing npm deps in {project_dir} ...", flush=True)
+            run_cmd(["npm", mode, "--no-audit", "--no-fund"], cwd=project_dir)
+            if entry is not None:
+                _store_node_modules(node_modules, entry)
         _write_marker(marker, expected_fp)
-    elif expected_fp and not current_fp:
-        # Backfill marker for existing healthy installs so future drift is detected.
+    elif expected_fp and current_fp != expected_fp:
+        # Backfill a missing marker (so future drift is detected), or refresh its
+        # stat fields (legacy format, touched-but-identical file).
         _write_marker(marker, expected_fp)
 
 
-def ensure_python_deps(mqtt_repo: Path, system_python: str) -> str:
+def ensure_python_deps(
+    mqtt_repo: Path,
+    system_python: str,
+    *,
+    fingerprints: Optional[tuple[str, str]] = None,
+) -> str:
     """
     Ensure the mqtt backend virtualenv + requirements exist.
 
+    `fingerprints` is a precomputed `(current_fp, expected_fp)` (see ensure_all_deps).
+
     Returns:
       Path to the venv python to use.
     """
@@ -178,8 +431,9 @@ def ensure_python_deps(mqtt_repo: Path, system_python: str) -> str:
     venv_dir = mqtt_repo / ".venv"
     venv_python = venv_dir / "bin" / "python"
     marker = venv_dir / ".deps_installed"
-    expected_fp = _python_dep_fingerprint(mqtt_repo)
-    current_fp = _read_marker(marker)
+    current_fp, expected_fp = fingerprints or _marker_fingerprints(
+        marker, lambda prev: _python_dep_fingerprint(mqtt_repo, prev)
+    )
 
     if not venv_python.exists():
         print("[runner] Creating python venv for mqtt_dashboard_watch ...", flush=True)
@@ -187,9 +441,53 @@ def ensure_python_deps(mqtt_repo: Path, system_python: str) -> str:
 
     py = str(venv_python) if venv_python.exists() else system_python
 
-    if not marker.exists() or (expected_fp and current_fp != expected_fp):
+    # Steady state: marker matches requirements.txt, so pip is skipped entirely.
+    # A missing marker reads as "" (e.g. fresh venv) and forces an install.
+    if not current_fp or (expected_fp and not _same_fingerprint(current_fp, expected_fp)):
         print("[runner] Installing python deps for mqtt_dashboard_watch ...", flush=True)
         run_cmd([py, "-m", "pip", "install", "-r", "requirements.txt"], cwd=mqtt_repo)
         _write_marker(marker, expected_fp)
+    elif current_fp != expected_fp:
+        # Same requirements; only the stat fields changed (or legacy marker).
+        _write_marker(marker, expected_fp)
+
+    return py
+
+
+def ensure_all_deps(
+    node_projects: list[Path], mqtt_repo: Optional[Path], system_python: str
+) -> str:
+    """
+    Ensure Python (mqtt backend) and Node deps for every installed project.
+
+    The fingerprint checks (marker read + stat/hash) have no data dependencies,
+    so they run concurrently; installs (`pip`/`npm`) then run one at a time,
+    Python first, in the given order.
+
+    Returns:
+      Python command for the mqtt backend (`system_python` when no mqtt repo).
+    """
+    with ThreadPoolExecutor(max_workers=len(node_projects) + 1) as pool:
+        py_future = None
+        if mqtt_repo is not None:
+            py_future = pool.submit(
+                _marker_fingerprints,
+                mqtt_repo / ".venv" / ".deps_installed",
+                lambda prev: _python_dep_fingerprint(mqtt_repo, prev),
+            )
+        node_futures = [
+            pool.submit(
+                _marker_fingerprints,
+                project / ".deps_installed",
+                # Bind `project` now; the lambda runs on a worker thread.
+                lambda prev, project=project: _node_dep_fingerprint(project, prev),
+            )
+            for project in node_projects
+        ]
 
+    py = system_python
+    if py_future is not None:
+        py = ensure_python_deps(mqtt_repo, system_python, fingerprints=py_future.result())
+    for project, fut in zip(node_projects, node_futures):
+        ensure_node_deps(project, fingerprints=fut.result())
     return py
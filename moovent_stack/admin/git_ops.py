@@ -20,18 +20,21 @@ def git_cmd(repo: Path, args: list[str], timeout_s: float = 4.0) -> tuple[bool,
     """
     Run a git command in a repo directory.
     Returns (success, output_or_error).
+
+    Output is captured as bytes and decoded as UTF-8 with replacement, so a
+    non-UTF-8 commit subject or path can't fail the whole call.
     """
     try:
         result = subprocess.run(
             ["git"] + args,
             cwd=str(repo),
             capture_output=True,
-            text=True,
             timeout=timeout_s,
         )
+        stdout = result.stdout.decode("utf-8", errors="replace").strip()
         if result.returncode == 0:
-            return True, result.stdout.strip()
-        return False, result.stderr.strip() or result.stdout.strip()
+            return True, stdout
+        return False, result.stderr.decode("utf-8", errors="replace").strip() or stdout
     except subprocess.TimeoutExpired:
         return False, "timeout"
     except Exception as e:
@@ -135,22 +138,23 @@ def collect_git_info(repo: Path, fetch: bool = False) -> dict[str, object]:
     if not info["is_git"]:
         return info
     
-    # Current branch
-    ok, branch = git_cmd(repo, ["rev-parse", "--abbrev-ref", "HEAD"])
+    # Branch, commit and dirty state in one call (porcelain v2 headers + entries).
+    ok, status = git_cmd(repo, ["status", "--porcelain=v2", "--branch"])
     if ok:
-        info["branch"] = branch
-    
-    # Current commit
-    ok, commit = git_cmd(repo, ["rev-parse", "HEAD"])
-    if ok:
-        info["commit"] = commit
-        info["commit_short"] = commit[:8]
-    
-    # Dirty state
-    ok, status = git_cmd(repo, ["status", "--porcelain"])
-    if ok:
-        info["dirty"] = bool(status.strip())
-    
+        head = oid = None
+        for line in status.splitlines():
+            if line.startswith("# branch.oid "):
+                oid = line[len("# branch.oid "):].strip()
+            elif line.startswith("# branch.head "):
+                head = line[len("# branch.head "):].strip()
+            elif line and not line.startswith("#"):
+                info["dirty"] = True
+        # Unborn branch: no commit yet, mirror `rev-parse HEAD` failing.
+        if oid and oid != "(initial)":
+            info["commit"] = oid
+            info["commit_short"] = oid[:8]
+            info["branch"] = "HEAD" if head == "(detached)" else head
+
     # Remote URL
     ok, remote = git_cmd(repo, ["remote", "get-url", "origin"])
     if ok:
@@ -159,7 +163,22 @@ def collect_git_info(repo: Path, fetch: bool = False) -> dict[str, object]:
     # Optional: refresh origin refs (only when explicitly forced).
     if fetch:
         git_cmd(repo, ["fetch", "--quiet", "origin"], timeout_s=UPDATE_GIT_TIMEOUT_S)
-    
+
+    # Local + origin branches with their tip commit and subject in one call.
+    local_branches: list[str] = []
+    remote_tips: dict[str, tuple[str, str]] = {}
+    refs = git_lines(
+        repo,
+        ["for-each-ref", "--format=%(refname)%00%(objectname)%00%(subject)", "refs/heads", "refs/remotes/origin"],
+    )
+    for line in refs:
+        refname, _, rest = line.partition("\0")
+        sha, _, subject = rest.partition("\0")
+        if refname.startswith("refs/heads/"):
+            local_branches.append(refname[len("refs/heads/"):])
+        elif refname.startswith("refs/remotes/origin/") and not refname.endswith("/HEAD"):
+            remote_tips[refname[len("refs/remotes/origin/"):]] = (sha, subject)
+
     # Ahead/behind + upstream latest commit
     branch = info["branch"]
     if branch and branch != "HEAD":
@@ -174,13 +193,11 @@ def collect_git_info(repo: Path, fetch: bool = False) -> dict[str, object]:
                 except ValueError:
                     pass
 
-        ok, upstream_commit = git_cmd(repo, ["rev-parse", origin_ref])
-        if ok and upstream_commit:
+        upstream_commit, subj = remote_tips.get(str(branch), ("", ""))
+        if upstream_commit:
             info["upstream_commit"] = upstream_commit
             info["upstream_commit_short"] = upstream_commit[:8]
-            ok, subj = git_cmd(repo, ["show", "-s", "--format=%s", origin_ref])
-            if ok:
-                info["upstream_subject"] = subj
+            info["upstream_subject"] = subj
             remote_url = str(info.get("remote_url") or "")
             url = github_commit_url(remote_url, upstream_commit)
             if url:
@@ -192,17 +209,10 @@ def collect_git_info(repo: Path, fetch: bool = False) -> dict[str, object]:
             behind = 0
         dirty = bool(info.get("dirty"))
         info["can_update_latest"] = bool((behind > 0) and (not dirty) and bool(info.get("upstream_commit")))
-    
-    # Local branches
-    info["branches_local"] = git_lines(repo, ["branch", "--format=%(refname:short)"])[:GIT_BRANCH_LIMIT]
-    
-    # Remote branches
-    remote_branches = git_lines(repo, ["branch", "-r", "--format=%(refname:short)"])
-    info["branches_remote"] = [
-        b.replace("origin/", "") for b in remote_branches 
-        if b.startswith("origin/") and not b.endswith("/HEAD")
-    ][:GIT_BRANCH_LIMIT]
-    
+
+    info["branches_local"] = local_branches[:GIT_BRANCH_LIMIT]
+    info["branches_remote"] = list(remote_tips)[:GIT_BRANCH_LIMIT]
+
     return info
 
 
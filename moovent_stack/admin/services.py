@@ -8,6 +8,7 @@ Purpose:
 from __future__ import annotations
 
 import os
+import select
 import signal
 import socket
 import subprocess
@@ -16,7 +17,7 @@ import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 from shutil import which
 
 from .logs import LogStore
@@ -63,6 +64,9 @@ def _popen(*, cmd: list[str], cwd: Path, env: dict[str, str]) -> subprocess.Pope
             stderr=subprocess.STDOUT,
             text=True,
             bufsize=1,
+            # Python-created fds are non-inheritable (PEP 446), so skipping the
+            # close-all-fds pass in the child is safe and makes spawning cheaper.
+            close_fds=False,
             start_new_session=True,
         )
 
@@ -106,10 +110,78 @@ def tcp_open_any(port: int, timeout_s: float = 0.6) -> bool:
         return False
 
 
+_TCP_LISTEN = "0A"
+
+
+def _proc_tcp_listen_pids(port: int) -> Optional[list[int]]:
+    """
+    Linux: find listener PIDs from `/proc` without spawning a subprocess.
+
+    Reads LISTEN socket inodes for `port` from `/proc/net/tcp{,6}`, then maps
+    them to PIDs via the `socket:[<inode>]` links under `/proc/<pid>/fd`.
+    Processes we may not inspect are skipped, like `lsof` does.
+    Returns None when the socket tables are unreadable.
+    """
+    inodes: set[str] = set()
+    readable = False
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table, encoding="ascii", errors="replace") as f:
+                rows = f.read().splitlines()[1:]
+        except OSError:
+            continue
+        readable = True
+        for row in rows:
+            # sl local_address rem_address st tx:rx tr:when retrnsmt uid timeout inode
+            fields = row.split()
+            if len(fields) < 10 or fields[3] != _TCP_LISTEN or fields[9] == "0":
+                continue
+            try:
+                if int(fields[1].rpartition(":")[2], 16) == port:
+                    inodes.add(fields[9])
+            except ValueError:
+                continue
+    if not readable:
+        return None
+    if not inodes:
+        return []
+
+    targets = {f"socket:[{inode}]" for inode in inodes}
+    pids: list[int] = []
+    try:
+        proc_entries = list(os.scandir("/proc"))
+    except OSError:
+        return None
+    for proc_entry in proc_entries:
+        if not proc_entry.name.isdigit():
+            continue
+        try:
+            with os.scandir(f"{proc_entry.path}/fd") as fds:
+                for fd in fds:
+                    try:
+                        if os.readlink(fd.path) in targets:
+                            pids.append(int(proc_entry.name))
+                            break
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return sorted(pids)
+
+
 def tcp_listen_pids(port: int, *, ttl_s: float = 2.0) -> list[int]:
-    """Get PIDs of processes listening on a port (macOS/Linux only)."""
+    """
+    Get PIDs of processes listening on a port (macOS/Linux only).
+
+    Linux reads `/proc` directly; other platforms (or an unreadable `/proc`)
+    fall back to `lsof`.
+    """
     if sys.platform == "win32":
         return []
+    if sys.platform.startswith("linux"):
+        pids = _proc_tcp_listen_pids(int(port))
+        if pids is not None:
+            return pids
     try:
         result = subprocess.run(
             ["lsof", "-nP", f"-iTCP:{port}", "-sTCP:LISTEN", "-t"],
@@ -138,28 +210,84 @@ def pid_alive(pid: int) -> bool:
         return False
 
 
-def pid_command(pid: int, *, ttl_s: float = 1.0) -> str:
+def pid_commands(pids: Iterable[int], *, ttl_s: float = 1.0) -> dict[int, str]:
     """
-    Best-effort: get a PID's command line (macOS/Linux only).
+    Best-effort: get command lines for several PIDs at once (macOS/Linux only).
 
     Notes:
-      - Used for UI diagnostics only.
-      - Returns "" if unavailable.
+      - Linux reads `/proc/<pid>/cmdline` directly (no subprocess).
+      - Elsewhere a single `ps -p <pid,...>` call covers every PID.
+      - PIDs whose command is unavailable map to "".
     """
-    if sys.platform == "win32":
-        return ""
+    wanted = [int(pid) for pid in pids]
+    out = {pid: "" for pid in wanted}
+    if not wanted or sys.platform == "win32":
+        return out
+    if sys.platform.startswith("linux"):
+        for pid in wanted:
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as f:
+                    raw = f.read()
+            except OSError:
+                continue
+            out[pid] = raw.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", errors="replace").strip()
+        return out
     try:
         result = subprocess.run(
-            ["ps", "-p", str(pid), "-o", "command="],
+            ["ps", "-p", ",".join(str(pid) for pid in wanted), "-o", "pid=,command="],
             capture_output=True,
             text=True,
             timeout=ttl_s,
         )
-        if result.returncode != 0:
-            return ""
-        return (result.stdout or "").strip()
     except Exception:
-        return ""
+        return out
+    for line in (result.stdout or "").splitlines():
+        pid_s, _, cmd = line.strip().partition(" ")
+        if pid_s.isdigit() and int(pid_s) in out:
+            out[int(pid_s)] = cmd.strip()
+    return out
+
+
+def pid_command(pid: int, *, ttl_s: float = 1.0) -> str:
+    """
+    Best-effort: get a PID's command line (macOS/Linux only).
+
+    Notes:
+      - Used for UI diagnostics only.
+      - Returns "" if unavailable.
+    """
+    return pid_commands([pid], ttl_s=ttl_s).get(int(pid), "")
+
+
+def _pidfd_open(pid: int) -> Optional[int]:
+    """Open a pidfd for `pid` (Linux 5.3+, Python 3.9+); None when unsupported or gone."""
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(pid)
+    except OSError:
+        return None
+
+
+def _wait_pid_exit(pid: int, pidfd: Optional[int], timeout_s: float) -> bool:
+    """
+    Wait up to `timeout_s` for `pid` to exit; True once it has.
+
+    With a pidfd the kernel wakes us on exit (no polling); otherwise fall back
+    to probing with signal 0 every 50ms.
+    """
+    if pidfd is not None:
+        try:
+            ready, _, _ = select.select([pidfd], [], [], timeout_s)
+            return bool(ready)
+        except (OSError, ValueError):
+            pass
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if not pid_alive(pid):
+            return True
+        time.sleep(0.05)
+    return False
 
 
 def terminate_pid(pid: int, *, timeout_s: float = 2.0) -> tuple[bool, str]:
@@ -169,38 +297,38 @@ def terminate_pid(pid: int, *, timeout_s: float = 2.0) -> tuple[bool, str]:
     Safety:
       - Only works for processes owned by the current user.
       - Returns (ok, detail) for UI reporting.
+      - The pidfd is opened before signalling, so a recycled PID is never waited on.
     """
+    pidfd = _pidfd_open(pid)
     try:
-        os.kill(pid, signal.SIGTERM)
-    except ProcessLookupError:
-        return True, "already_exited"
-    except PermissionError:
-        return False, "permission_denied"
-    except Exception as exc:
-        return False, f"sigterm_failed:{type(exc).__name__}"
-
-    deadline = time.time() + max(0.1, float(timeout_s))
-    while time.time() < deadline:
-        if not pid_alive(pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return True, "already_exited"
+        except PermissionError:
+            return False, "permission_denied"
+        except Exception as exc:
+            return False, f"sigterm_failed:{type(exc).__name__}"
+
+        if _wait_pid_exit(pid, pidfd, max(0.1, float(timeout_s))):
             return True, "terminated"
-        time.sleep(0.05)
 
-    try:
-        os.kill(pid, signal.SIGKILL)
-    except ProcessLookupError:
-        return True, "already_exited"
-    except PermissionError:
-        return False, "permission_denied"
-    except Exception as exc:
-        return False, f"sigkill_failed:{type(exc).__name__}"
-
-    # Final short wait.
-    deadline = time.time() + 1.0
-    while time.time() < deadline:
-        if not pid_alive(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return True, "already_exited"
+        except PermissionError:
+            return False, "permission_denied"
+        except Exception as exc:
+            return False, f"sigkill_failed:{type(exc).__name__}"
+
+        # Final short wait.
+        if _wait_pid_exit(pid, pidfd, 1.0):
             return True, "killed"
-        time.sleep(0.05)
-    return False, "still_alive"
+        return False, "still_alive"
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
 
 
 def _is_stale_listener_for_service(spec: ServiceSpec, cmdline: str) -> bool:
@@ -229,9 +357,10 @@ def free_listening_port(port: int, *, limit: int = 5) -> dict[str, object]:
       {"port": int, "listeners": [...], "results": [...], "freed": bool}
     """
     listeners = tcp_listen_pids(int(port))[: max(0, int(limit))]
+    commands = pid_commands(listeners)
     results: list[dict[str, object]] = []
     for pid in listeners:
-        cmd = pid_command(pid)
+        cmd = commands.get(pid, "")
         ok, detail = terminate_pid(pid)
         results.append({"pid": pid, "ok": ok, "detail": detail, "command": cmd})
 
@@ -322,8 +451,9 @@ class StackManager:
             # processes keep ports (3000/4000) alive.
             if spec.port:
                 listeners = tcp_listen_pids(int(spec.port))[:5]
+                commands = pid_commands(listeners)
                 for pid in listeners:
-                    cmd = pid_command(pid)
+                    cmd = commands.get(pid, "")
                     if not _is_stale_listener_for_service(spec, cmd):
                         continue
                     ok, detail = terminate_pid(pid)
@@ -351,6 +481,7 @@ class StackManager:
                 self.last_pids[name] = int(new_proc.pid)
             self.log_store.append(name, f"[runner] started (pid={new_proc.pid})")
             threading.Thread(target=self._stream_proc, args=(name, new_proc), daemon=True).start()
+            threading.Thread(target=self._wait_proc, args=(name, new_proc), daemon=True).start()
             return True
 
     def stop(self, name: str) -> bool:
@@ -560,6 +691,21 @@ class StackManager:
             if not self.quiet:
                 print(f"[runner] log stream error for {name}: {exc}", flush=True)
 
+    def _wait_proc(self, name: str, proc: subprocess.Popen) -> None:
+        """
+        Block until the child exits and record unexpected exits as they happen.
+
+        Notes:
+          - Separate from `_stream_proc`: a grandchild that inherited stdout can
+            keep the pipe open long after the child itself has exited.
+        """
+        try:
+            code = proc.wait()
+        except Exception:
+            return
+        if self.procs.get(name) is proc and self.desired_running.get(name, False):
+            self.note_exit(name, code)
+
 
 def restart_repo_services(manager: StackManager, repo: Path) -> list[str]:
     """
@@ -7,10 +7,21 @@ Purpose:
 
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass
+from fnmatch import translate
+import os
 from pathlib import Path
+import re
 import time
 
+from .config import RACY_MTIME_WINDOW_NS
+
+# Directories never descended into: dependency installs, VCS data and caches.
+# Their contents change on every `npm ci` / pip install, which the watchdog
+# itself triggers, and they dwarf the source tree.
+_SKIP_DIRS = frozenset({"node_modules", ".git", "__pycache__", ".venv", "venv"})
+
 
 @dataclass(frozen=True)
 class WatchRule:
@@ -38,35 +49,139 @@ class ServiceWatchdog:
     Polling watchdog with per-rule debounce.
 
     Notes:
-    - Uses latest mtime across watched patterns.
+    - Walks each rule's tree once at `prime()`; polls re-stat only the cached
+      matched files and directories, rescanning when a directory mtime moves
+      (an entry was added, removed or renamed), or while a directory's mtime
+      is within `RACY_MTIME_WINDOW_NS` of the last scan.
+    - A rule with a pending (debouncing) change is not re-stat'ed until its
+      window closes.
+    - Per-rule state is kept as parallel path lists and `array('q')` mtimes
+      (ns) rather than a dict of Path objects.
+    - Walks the tree in-process with `os.scandir`, skipping `_SKIP_DIRS`.
     - Emits at most one event per detected change burst.
     """
 
     def __init__(self, rules: list[WatchRule]) -> None:
         self._rules = rules
-        self._last_seen: dict[int, float] = {}
+        # Hot-loop inputs as plain strings/regexes; Path objects stay at the API edge.
+        self._roots = [str(rule.root) for rule in rules]
+        self._matchers = [self._compile_globs(rule.globs) for rule in rules]
+        self._paths: list[list[str]] = [[] for _ in rules]
+        self._mtimes_ns: list[array] = [array("q") for _ in rules]
+        self._dirs: list[list[str]] = [[] for _ in rules]
+        self._dir_mtimes_ns: list[array] = [array("q") for _ in rules]
+        self._racy: list[bool] = [False for _ in rules]
         self._pending_since: dict[int, float] = {}
 
-    def _latest_mtime(self, rule: WatchRule) -> float:
-        latest = 0.0
-        root = rule.root
-        if not root.exists():
-            return latest
-        for pattern in rule.globs:
+    @staticmethod
+    def _compile_globs(globs: list[str]) -> tuple[re.Pattern[str], re.Pattern[str]]:
+        """
+        Compile globs once into (name regex, relative-path regex).
+
+        Each side is a single alternation of every glob's `fnmatch.translate`
+        form, so one `match()` call tests all patterns. Matches like
+        `Path.rglob(pattern)`: bare names at any depth, `**/` as zero or more dirs.
+        """
+        name_parts: list[str] = []
+        rel_parts: list[str] = []
+        for pattern in globs:
+            if "/" not in pattern:
+                name_parts.append(translate(pattern))
+                continue
+            for pat in {pattern, pattern.replace("**/", "")}:
+                rel_parts.append(translate(pat))
+                rel_parts.append(translate("*/" + pat))
+
+        def union(parts: list[str]) -> re.Pattern[str]:
+            # `(?!)` never matches: a rule with no globs of this kind.
+            return re.compile("|".join(f"(?:{p})" for p in parts) or "(?!)")
+
+        return union(name_parts), union(rel_parts)
+
+    def _scan(self, i: int) -> None:
+        """Walk rule `i`'s tree and replace its cached files/dirs and mtimes."""
+        name_re, rel_re = self._matchers[i]
+        paths: list[str] = []
+        mtimes = array("q")
+        dirs: list[str] = []
+        dir_mtimes = array("q")
+        root = self._roots[i]
+        scanned_ns = time.time_ns()
+        try:
+            # Stat dirs before listing them, so a concurrent add is caught next poll.
+            dir_mtimes.append(os.stat(root).st_mtime_ns)
+            dirs.append(root)
+        except OSError:
+            pass
+        # Explicit-stack scandir walk: no Path objects per entry, pruned dirs skipped.
+        stack = [(root, "")] if dirs else []
+        while stack:
+            dir_path, rel_dir = stack.pop()
             try:
-                for path in root.rglob(pattern):
+                it = os.scandir(dir_path)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    name = entry.name
+                    rel = rel_dir + name
                     try:
-                        latest = max(latest, path.stat().st_mtime)
-                    except Exception:
+                        if entry.is_dir(follow_symlinks=False):
+                            if name not in _SKIP_DIRS:
+                                dir_mtimes.append(entry.stat(follow_symlinks=False).st_mtime_ns)
+                                dirs.append(entry.path)
+                                stack.append((entry.path, rel + "/"))
+                            continue
+                        if not (name_re.match(name) or rel_re.match(rel)):
+                            continue
+                        mtimes.append(entry.stat().st_mtime_ns)
+                        paths.append(entry.path)
+                    except OSError:
                         continue
-            except Exception:
-                continue
-        return latest
+        self._paths[i] = paths
+        self._mtimes_ns[i] = mtimes
+        self._dirs[i] = dirs
+        self._dir_mtimes_ns[i] = dir_mtimes
+        self._racy[i] = any(scanned_ns - mtime_ns < RACY_MTIME_WINDOW_NS for mtime_ns in dir_mtimes)
+
+    def _refresh(self, i: int) -> bool:
+        """Re-stat rule `i`'s cached entries in place; return True if a watched file changed."""
+        changed = False
+        paths = self._paths[i]
+        mtimes = self._mtimes_ns[i]
+        for j in range(len(paths)):
+            try:
+                mtime_ns = os.stat(paths[j]).st_mtime_ns
+            except OSError:
+                mtime_ns = -1
+            if mtime_ns != mtimes[j]:
+                mtimes[j] = mtime_ns
+                changed = True
+
+        # A missing root is re-checked every poll so it is picked up once created;
+        # so is a tree with a dir inside the racy window (its mtime may not move).
+        rescan = not self._dirs[i] or self._racy[i]
+        dir_mtimes = self._dir_mtimes_ns[i]
+        for j, dir_path in enumerate(self._dirs[i]):
+            try:
+                if os.stat(dir_path, follow_symlinks=False).st_mtime_ns != dir_mtimes[j]:
+                    rescan = True
+                    break
+            except OSError:
+                rescan = True
+                break
+        if rescan:
+            # Unrelated entries (editor swap files, __pycache__) also move dir
+            # mtimes; only a different watched-file set counts as a change.
+            self._scan(i)
+            if self._paths[i] != paths or self._mtimes_ns[i] != mtimes:
+                changed = True
+        return changed
 
     def prime(self) -> None:
         """Capture a baseline so existing files don't trigger immediately."""
-        for i, rule in enumerate(self._rules):
-            self._last_seen[i] = self._latest_mtime(rule)
+        for i in range(len(self._rules)):
+            self._scan(i)
             self._pending_since.pop(i, None)
 
     def poll(self, now: float | None = None) -> list[WatchEvent]:
@@ -75,21 +190,19 @@ class ServiceWatchdog:
         out: list[WatchEvent] = []
 
         for i, rule in enumerate(self._rules):
-            latest = self._latest_mtime(rule)
-            prev = self._last_seen.get(i, 0.0)
-
-            if latest > prev + 1e-9:
-                # First detection of this burst.
-                if i not in self._pending_since:
-                    self._pending_since[i] = t
-                    self._last_seen[i] = latest
-                else:
-                    # Continue tracking latest mtime while waiting debounce.
-                    self._last_seen[i] = max(self._last_seen[i], latest)
-
             pending_at = self._pending_since.get(i)
             if pending_at is None:
-                continue
+                if not self._refresh(i):
+                    continue
+                # First detection of this burst.
+                pending_at = self._pending_since[i] = t
+            elif (t - pending_at) >= max(0.0, rule.debounce_s):
+                # Burst over: fold edits made during the window into the
+                # baseline so they don't re-trigger after this event.
+                self._refresh(i)
+
+            # Mid-burst polls skip the rule entirely; nothing is stat'ed until
+            # the debounce window closes.
             if (t - pending_at) < max(0.0, rule.debounce_s):
                 continue
 
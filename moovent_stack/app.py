@@ -114,6 +114,7 @@ def main() -> int:
             print("[runner] To stop all services: pkill -f moovent_stack.admin")
             return 0
         host, client_id, client_secret = _resolve_infisical_settings()
+        # Setup may have saved a new workspace_root (re-read from config).
         runner_path = _resolve_runner_path()
         log_info("app", f"Post-setup runner path: {runner_path}")
         if not client_id or not client_secret or not runner_path:
@@ -161,11 +162,11 @@ def main() -> int:
         workspace_root / "mqtt_dashboard_watch" / ".env",
         workspace_root / "dashboard" / "server" / ".env",
     ]:
-        if env_path.exists():
-            workspace_env = read_dotenv(env_path)
-            for k in config_keys:
-                if k in workspace_env and not os.environ.get(k):
-                    os.environ[k] = workspace_env[k]
+        # read_dotenv returns {} for a missing file; no separate exists() probe.
+        workspace_env = read_dotenv(env_path)
+        for k in config_keys:
+            if k in workspace_env and not os.environ.get(k):
+                os.environ[k] = workspace_env[k]
     
     # Inject Infisical runtime env for all projects accessible to this identity.
     # _build_runner_env handles the mqtt baseline keys (BROKER/MONGO/etc.).
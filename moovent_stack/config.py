@@ -4,6 +4,7 @@ Shared configuration and environment helpers for moovent-stack.
 
 from __future__ import annotations
 
+import functools
 import os
 from pathlib import Path
 from typing import Optional
@@ -113,6 +114,7 @@ def _current_year() -> int:
 __version__ = _get_version()
 
 
+@functools.lru_cache(maxsize=128)
 def _env_bool(value: Optional[str]) -> bool:
     if not value:
         return False
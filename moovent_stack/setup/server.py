@@ -43,10 +43,12 @@ from ..config import INFISICAL_PROJECT_IDS
 from ..log import get_log_path, log_error, log_info
 from ..storage import _load_config, _save_config
 from ..workspace import (
-    _clone_or_update_repo,
+    _clone_or_update_many,
     _ensure_workspace_runner,
     _ensure_mqtt_admin_dashboard_shadcn_utils,
     _inject_infisical_env,
+    _redact_credentials,
+    _snapshot_workspace,
     _default_workspace_path,
     _resolve_runner_path,
 )
@@ -631,58 +633,55 @@ def _run_setup_server() -> bool:
                             )
                             root.mkdir(parents=True, exist_ok=True)
 
-                            # Only clone selected repos.
+                            # Only clone selected repos; clones run concurrently.
+                            specs = []
                             if install_mqtt:
-                                log_info("setup", f"Cloning mqtt_dashboard_watch (branch={mqtt_branch})")
-                                install.update(
-                                    10,
-                                    "Downloading",
-                                    "Cloning mqtt_dashboard_watch…",
-                                    f"branch: {mqtt_branch}",
+                                specs.append(
+                                    (
+                                        "Moovent",
+                                        "mqtt_dashboard_watch",
+                                        mqtt_branch,
+                                        root / "mqtt_dashboard_watch",
+                                        token,
+                                    )
                                 )
-                                _clone_or_update_repo(
-                                    "Moovent",
-                                    "mqtt_dashboard_watch",
-                                    mqtt_branch,
-                                    root / "mqtt_dashboard_watch",
-                                    token,
-                                )
-                                log_info("setup", "mqtt_dashboard_watch cloned successfully")
-                                install.update(
-                                    60,
-                                    "Downloading",
-                                    "mqtt_dashboard_watch ready.",
-                                    "",
+                            if install_dashboard:
+                                specs.append(
+                                    (
+                                        "Moovent",
+                                        "dashboard",
+                                        dashboard_branch,
+                                        root / "dashboard",
+                                        token,
+                                    )
                                 )
+                            names = ", ".join(spec[1] for spec in specs)
+                            branches = ", ".join(f"{spec[1]}@{spec[2]}" for spec in specs)
+                            log_info("setup", f"Cloning {branches}")
+                            install.update(
+                                10,
+                                "Downloading",
+                                f"Cloning {names}…",
+                                f"branches: {branches}",
+                            )
+                            _clone_or_update_many(specs)
+                            log_info("setup", f"{names} cloned successfully")
+                            install.update(90, "Downloading", f"{names} ready.", "")
+
+                            if install_mqtt:
                                 # Ensure frontend can boot (some branches miss shadcn utils file).
                                 _ensure_mqtt_admin_dashboard_shadcn_utils(root)
                                 log_info("setup", "Ensured mqtt-admin-dashboard shadcn utils")
 
-                            if install_dashboard:
-                                log_info("setup", f"Cloning dashboard (branch={dashboard_branch})")
-                                install.update(
-                                    65,
-                                    "Downloading",
-                                    "Cloning dashboard…",
-                                    f"branch: {dashboard_branch}",
-                                )
-                                _clone_or_update_repo(
-                                    "Moovent",
-                                    "dashboard",
-                                    dashboard_branch,
-                                    root / "dashboard",
-                                    token,
-                                )
-                                log_info("setup", "dashboard cloned successfully")
-                                install.update(90, "Downloading", "dashboard ready.", "")
-
                             install.update(
                                 92,
                                 "Configuring",
                                 "Injecting Infisical scope into mqtt_dashboard_watch/.env…",
                                 "",
                             )
-                            _inject_infisical_env(root)
+                            # One listing of the fresh workspace serves both steps below.
+                            snapshot = _snapshot_workspace(root)
+                            _inject_infisical_env(root, snapshot=snapshot)
                             log_info("setup", "Infisical env injected")
 
                             install.update(
@@ -691,7 +690,7 @@ def _run_setup_server() -> bool:
                                 "Ensuring run_local_stack.py exists…",
                                 "",
                             )
-                            _ensure_workspace_runner(root)
+                            _ensure_workspace_runner(root, snapshot=snapshot)
                             log_info("setup", f"Workspace runner created: {root / 'run_local_stack.py'}")
 
                             install.update(
@@ -751,8 +750,16 @@ def _run_setup_server() -> bool:
                             log_info("setup", "Install complete")
                             install.finish("Moovent Stack is running!")
                         except Exception as exc:
-                            log_error("setup", f"Install failed: {exc}")
-                            install.fail(f"Download failed: {exc}")
+                            # CalledProcessError carries the clone URL (with token)
+                            # in its command and git's captured output.
+                            detail = _redact_credentials(str(exc))
+                            log_error("setup", f"Install failed: {detail}")
+                            output = getattr(exc, "output", None)
+                            if isinstance(output, bytes):
+                                output = output.decode("utf-8", errors="replace")
+                            if output and output.strip():
+                                log_error("setup", f"Command output:\n{_redact_credentials(output.rstrip())}")
+                            install.fail(f"Download failed: {detail}")
 
                     threading.Thread(target=_worker, daemon=True).start()
 
@@ -4,13 +4,36 @@ Local config/cache storage helpers.
 
 from __future__ import annotations
 
+import copy
 import json
 import os
+import tempfile
 from pathlib import Path
 
 from .config import CONFIG_PATH
 
 
+def _atomic_write(path: Path, data: bytes) -> None:
+    """
+    Replace `path` with `data` atomically (readers see the old or new file, never a torn one).
+
+    The temp file is created next to `path` by mkstemp, so the result is
+    user-readable only (0600) without a separate chmod. The temp file is
+    removed and the error re-raised on failure.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
 def _load_json(path: Path) -> dict:
     if not path.exists():
         return {}
@@ -30,11 +53,37 @@ def _save_json(path: Path, data: dict) -> None:
             pass
     except Exception:
         return
+    finally:
+        if path == CONFIG_PATH:
+            _invalidate_config_cache()
+
+
+# Parsed config keyed by file path -> ((mtime_ns, size), data).
+# Repeated _load_config() calls cost one stat while the file is unchanged;
+# external edits change mtime/size and trigger a re-parse.
+_config_cache: dict[str, tuple[tuple[int, int], dict]] = {}
+
+
+def _invalidate_config_cache() -> None:
+    """Forget the parsed config (call after writing the config file)."""
+    _config_cache.clear()
 
 
 def _load_config() -> dict:
     """Load setup config (access URL/token) from disk."""
-    return _load_json(CONFIG_PATH)
+    path = CONFIG_PATH
+    try:
+        # Follow symlinks: dotfile managers often link the config file.
+        st = os.stat(path)
+    except OSError:
+        return {}
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _config_cache.get(str(path))
+    if cached is None or cached[0] != key:
+        cached = (key, _load_json(path))
+        _config_cache[str(path)] = cached
+    # Callers mutate the result before saving; never hand out the cached object.
+    return copy.deepcopy(cached[1])
 
 
 def _save_config(data: dict) -> None:
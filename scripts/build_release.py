@@ -10,34 +10,106 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import mmap
+import os
+import sys
 import tarfile
 from pathlib import Path
 
 
 def _sha256(path: Path) -> str:
-    hasher = hashlib.sha256()
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: hashing loop runs in C without per-chunk copies.
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        hasher = hashlib.sha256()
+        # Older runtimes: hash the whole file through a read-only mapping.
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm)
+        return hasher.hexdigest()
 
 
 def _version(repo_root: Path) -> str:
     return (repo_root / "VERSION").read_text(encoding="utf-8").strip()
 
 
+# Build/cache artifacts that must never ship in the release tarball.
+EXCLUDE_DIRS = frozenset({"__pycache__", ".pytest_cache", ".mypy_cache", ".git"})
+EXCLUDE_SUFFIX = (".pyc", ".pyo")
+
+
+def _filter(info: tarfile.TarInfo) -> tarfile.TarInfo | None:
+    # Returning None for a directory also skips everything below it, so
+    # excluded trees are never walked or opened.
+    base = info.name.rsplit("/", 1)[-1]
+    if base in EXCLUDE_DIRS or info.name.endswith(EXCLUDE_SUFFIX):
+        return None
+    # Drop builder-specific ownership so the archive only depends on content.
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def _add_sources(tar: tarfile.TarFile, repo_root: Path, name: str, include: list[str]) -> None:
+    # tarfile adds directory members in sorted order, so entry order is stable.
+    for rel in include:
+        tar.add(repo_root / rel, arcname=f"{name}/{rel}", recursive=True, filter=_filter)
+
+
+def _inputs_key(repo_root: Path, name: str, suffix: str, include: list[str], *, zstd: bool) -> str:
+    """
+    Hash what the tarball is built from: (path, size, mtime_ns, mode) per shipped file.
+
+    Also covers how it is built (this script's digest, the exclusion lists and
+    the compression flag), so changing the builder invalidates old outputs.
+    Same exclusions as `_filter`, so editing a cache file never forces a rebuild.
+    """
+    key = hashlib.sha256(f"{name}.{suffix}\n".encode("utf-8"))
+    key.update(f"script\0{_sha256(Path(__file__).resolve())}\n".encode("utf-8"))
+    key.update(f"exclude_dirs\0{','.join(sorted(EXCLUDE_DIRS))}\n".encode("utf-8"))
+    key.update(f"exclude_suffix\0{','.join(sorted(EXCLUDE_SUFFIX))}\n".encode("utf-8"))
+    key.update(f"zstd\0{int(zstd)}\n".encode("utf-8"))
+    for rel in include:
+        top = repo_root / rel
+        if top.is_file():
+            files = [top]
+        else:
+            files = []
+            for dirpath, dirnames, filenames in os.walk(top):
+                dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDE_DIRS)
+                files.extend(
+                    Path(dirpath, f) for f in sorted(filenames) if not f.endswith(EXCLUDE_SUFFIX)
+                )
+        for path in files:
+            st = path.stat()
+            rel_path = path.relative_to(repo_root).as_posix()
+            key.update(f"{rel_path}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode}\n".encode("utf-8"))
+    return key.hexdigest()
+
+
 def main() -> int:
     repo_root = Path(__file__).resolve().parents[1]
     version = _version(repo_root)
     name = f"moovent-stack-{version}"
 
     parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=Path, default=None)
     parser.add_argument(
-        "--output", type=Path, default=repo_root / "dist" / f"{name}.tar.gz"
+        "--zstd",
+        action="store_true",
+        help="Write a multi-threaded zstd tarball (.tar.zst). Requires `zstandard`.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the inputs are unchanged since the last build.",
     )
     args = parser.parse_args()
 
-    args.output.parent.mkdir(parents=True, exist_ok=True)
+    suffix = "tar.zst" if args.zstd else "tar.gz"
+    output = args.output or repo_root / "dist" / f"{name}.{suffix}"
+    output.parent.mkdir(parents=True, exist_ok=True)
 
     include = [
         "VERSION",
@@ -47,12 +119,42 @@ def main() -> int:
         "tests",
     ]
 
-    with tarfile.open(args.output, "w:gz") as tar:
-        for rel in include:
-            tar.add(repo_root / rel, arcname=f"{name}/{rel}")
-
-    print(f"[release] Wrote: {args.output}")
-    print(f"[release] sha256: {_sha256(args.output)}")
+    # Skip the rebuild when nothing shipped changed since the last build of this
+    # output (the sidecar is only written after a successful build).
+    inputs_path = output.with_name(output.name + ".inputs")
+    inputs_key = _inputs_key(repo_root, name, suffix, include, zstd=args.zstd)
+    if not args.force and output.exists():
+        try:
+            previous = inputs_path.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            previous = ""
+        if previous == inputs_key:
+            print(f"[release] Up to date: {output}")
+            print(f"[release] sha256: {_sha256(output)}")
+            return 0
+
+    if args.zstd:
+        try:
+            import zstandard
+        except ImportError:
+            print(
+                "[release] --zstd requires the `zstandard` package (pip install zstandard).",
+                file=sys.stderr,
+            )
+            return 2
+        # threads=-1: one compression worker per CPU core.
+        cctx = zstandard.ZstdCompressor(level=10, threads=-1)
+        with open(output, "wb") as raw, cctx.stream_writer(raw) as compressed:
+            with tarfile.open(fileobj=compressed, mode="w|") as tar:
+                _add_sources(tar, repo_root, name, include)
+    else:
+        # Default stays gzip: the Homebrew formula consumes the .tar.gz asset.
+        with tarfile.open(output, "w:gz") as tar:
+            _add_sources(tar, repo_root, name, include)
+
+    inputs_path.write_text(inputs_key + "\n", encoding="utf-8")
+    print(f"[release] Wrote: {output}")
+    print(f"[release] sha256: {_sha256(output)}")
     return 0
 
 
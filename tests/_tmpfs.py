@@ -0,0 +1,28 @@
+"""
+Shared module fixtures: put test temp dirs on tmpfs.
+
+Usage (module level in a test file):
+    from _tmpfs import setUpModule, tearDownModule  # noqa: F401
+
+On Linux, `tempfile` is pointed at /dev/shm for the module's tests unless
+TMPDIR is set explicitly, so throwaway repos/trees never hit the disk.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+
+_saved_tempdir = None
+
+
+def setUpModule() -> None:
+    global _saved_tempdir
+    _saved_tempdir = tempfile.tempdir
+    if sys.platform.startswith("linux") and "TMPDIR" not in os.environ and os.access("/dev/shm", os.W_OK):
+        tempfile.tempdir = "/dev/shm"
+
+
+def tearDownModule() -> None:
+    tempfile.tempdir = _saved_tempdir
@@ -4,188 +4,231 @@ import time
 import unittest
 import warnings
 from pathlib import Path
+from unittest.mock import patch
 from urllib.error import HTTPError
+from urllib.parse import urlsplit
 
-from moovent_stack import access, config, github, infisical, runner, workspace
+from moovent_stack import access, config, github, infisical, runner, storage, workspace
+from moovent_stack.admin import access as admin_access
 
 
+class _FakeResp:
+    """Minimal `urlopen()` response: context manager with a fixed body."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    def read(self) -> bytes:
+        return self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_ENV_BOOL_CASES = (("true", True), ("1", True), ("no", False))
+_NORMALIZE_HOST_CASES = (
+    ("app.infisical.com", "https://app.infisical.com"),
+    ("https://eu.infisical.com/", "https://eu.infisical.com"),
+)
+
+_LOGIN_BODY = b'{"accessToken":"token123"}'
+_SECRETS_EMPTY_BODY = b'{"secrets":[],"imports":[]}'
+
+_LOGIN_PATH = "/api/v1/auth/universal-auth/login"
+_SECRETS_PATH = "/api/v4/secrets"
+
+
+def _forbidden(url: str):
+    raise HTTPError(url, 403, "Forbidden", hdrs=None, fp=None)
+
+
+def _routed_urlopen(routes: dict):
+    """
+    Build a `urlopen` stand-in that dispatches on the request URL path.
+
+    `routes` maps path -> handler(url); returns (fake_urlopen, hit counts per path).
+    """
+    calls = dict.fromkeys(routes, 0)
+
+    def fake_urlopen(req, timeout=0):  # noqa: ANN001 - matches stdlib signature
+        url = getattr(req, "full_url", "")
+        path = urlsplit(url).path
+        handler = routes.get(path)
+        if handler is None:
+            raise AssertionError(f"Unexpected url: {url}")
+        calls[path] += 1
+        return handler(url)
+
+    return fake_urlopen, calls
+
+
+# Snapshot os.environ around every test and restore it afterwards, so a test
+# that sets variables directly can never leak them into its neighbours.
+@patch.dict(os.environ)
 class TestAccessGuard(unittest.TestCase):
-    def test_env_bool_parsing(self):
-        self.assertTrue(config._env_bool("true"))
-        self.assertTrue(config._env_bool("1"))
-        self.assertFalse(config._env_bool("no"))
+    @classmethod
+    def setUpClass(cls):
+        # Cache timestamps are relative to "now"; one reading serves every test
+        # (the margins used are far larger than the suite's runtime).
+        cls.now = time.time()
+        cls.safe_install_root_cases = (
+            (Path("/"), False),
+            (Path.home(), False),
+            (Path("/opt/homebrew/Cellar/moovent-stack/0.1.0/libexec"), True),
+            # Relative paths are never treated as a safe install root.
+            (Path("Cellar/moovent-stack"), False),
+        )
 
-    def test_cache_validity(self):
-        now = time.time()
-        self.assertTrue(access._cache_valid({"checked_at": now - 10}, 60))
-        self.assertFalse(access._cache_valid({"checked_at": now - 120}, 60))
+    def test_env_bool_parsing(self):
+        for value, expected in _ENV_BOOL_CASES:
+            with self.subTest(value=value):
+                self.assertEqual(config._env_bool(value), expected)
+
+    def test_pure_helpers_are_memoized(self):
+        host = infisical._normalize_infisical_host("eu.infisical.com/")
+        self.assertIs(infisical._normalize_infisical_host("eu.infisical.com/"), host)
+        hits = config._env_bool.cache_info().hits
+        config._env_bool("yes")
+        config._env_bool("yes")
+        self.assertGreater(config._env_bool.cache_info().hits, hits)
+
+    @patch.object(access.time, "time", return_value=1_700_000_000.0)
+    def test_cache_validity(self, _time):
+        # Pinned clock: the TTL boundary is exact, independent of wall time.
+        self.assertTrue(access._cache_valid({"checked_at": 1_699_999_990.0}, 60))
+        self.assertTrue(access._cache_valid({"checked_at": 1_699_999_940.0}, 60))
+        self.assertFalse(access._cache_valid({"checked_at": 1_699_999_880.0}, 60))
+        self.assertFalse(access._cache_valid({"checked_at": "1699999990"}, 60))
 
     def test_safe_install_root_checks_cellar(self):
-        self.assertFalse(workspace._safe_install_root(Path("/")))
-        self.assertFalse(workspace._safe_install_root(Path.home()))
-        self.assertTrue(
-            workspace._safe_install_root(
-                Path("/opt/homebrew/Cellar/moovent-stack/0.1.0/libexec")
-            )
-        )
+        for path, expected in self.safe_install_root_cases:
+            with self.subTest(path=path):
+                self.assertEqual(workspace._safe_install_root(path), expected)
 
     def test_resolve_runner_path_env(self):
-        os.environ[config.RUNNER_ENV_PATH] = "/tmp/run_local_stack.py"
-        path = workspace._resolve_runner_path()
+        with patch.dict(os.environ, {config.RUNNER_ENV_PATH: "/tmp/run_local_stack.py"}):
+            path = workspace._resolve_runner_path()
         self.assertEqual(path, Path("/tmp/run_local_stack.py"))
-        os.environ.pop(config.RUNNER_ENV_PATH, None)
-
-    def test_validate_runner_path(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            root = Path(tmpdir)
-            runner = root / "run_local_stack.py"
-            runner.write_text("# test")
-            (root / "mqtt_dashboard_watch").mkdir()
-            (root / "dashboard").mkdir()
-            ok, error = workspace._validate_runner_path(runner)
-            self.assertTrue(ok)
-            self.assertEqual(error, "")
 
-    def test_validate_runner_path_allows_missing_dashboard_when_unselected(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            root = Path(tmpdir)
-            runner = root / "run_local_stack.py"
-            runner.write_text("# test")
-            (root / "mqtt_dashboard_watch").mkdir()
-            ok, error = workspace._validate_runner_path(
-                runner, config_override={"install_dashboard": False}
-            )
-            self.assertTrue(ok)
-            self.assertEqual(error, "")
+    def test_resolve_runner_path_tracks_env_changes(self):
+        with patch.dict(os.environ, {config.RUNNER_ENV_PATH: "/tmp/a/run_local_stack.py"}):
+            self.assertEqual(workspace._resolve_runner_path(), Path("/tmp/a/run_local_stack.py"))
+            os.environ[config.RUNNER_ENV_PATH] = "/tmp/b/run_local_stack.py"
+            self.assertEqual(workspace._resolve_runner_path(), Path("/tmp/b/run_local_stack.py"))
 
-    def test_validate_runner_path_allows_missing_mqtt_when_unselected(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            root = Path(tmpdir)
-            runner = root / "run_local_stack.py"
-            runner.write_text("# test")
-            (root / "dashboard").mkdir()
-            ok, error = workspace._validate_runner_path(
-                runner, config_override={"install_mqtt": False, "install_dashboard": True}
-            )
-            self.assertTrue(ok)
-            self.assertEqual(error, "")
+    def test_resolve_runner_path_tracks_saved_workspace_root(self):
+        env = {k: v for k, v in os.environ.items() if k not in (config.RUNNER_ENV_PATH, config.WORKSPACE_ENV_ROOT)}
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+                storage, "CONFIG_PATH", Path(tmpdir) / "config.json"
+            ), patch.dict(os.environ, env, clear=True):
+                storage._invalidate_config_cache()
+                storage._save_config({"workspace_root": "/tmp/a"})
+                self.assertEqual(workspace._resolve_runner_path(), Path("/tmp/a/run_local_stack.py"))
+                storage._save_config({"workspace_root": "/tmp/b"})
+                self.assertEqual(workspace._resolve_runner_path(), Path("/tmp/b/run_local_stack.py"))
+        finally:
+            storage._invalidate_config_cache()
 
-    def test_validate_runner_path_requires_selection_when_none(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            root = Path(tmpdir)
-            runner = root / "run_local_stack.py"
-            runner.write_text("# test")
-            ok, error = workspace._validate_runner_path(
-                runner,
-                config_override={"install_mqtt": False, "install_dashboard": False},
-            )
-            self.assertFalse(ok)
-            self.assertEqual(error, "No repositories selected for installation.")
+    def test_config_bool(self):
+        self.assertTrue(workspace._config_bool(" Yes ", False))
+        self.assertFalse(workspace._config_bool("off", True))
+        self.assertFalse(workspace._config_bool(False, True))
+        self.assertTrue(workspace._config_bool(1, False))
+        self.assertFalse(workspace._config_bool(0.0, True))
+        self.assertTrue(workspace._config_bool(None, True))
 
     def test_normalize_infisical_host(self):
+        for value, expected in _NORMALIZE_HOST_CASES:
+            with self.subTest(value=value):
+                self.assertEqual(infisical._normalize_infisical_host(value), expected)
+
+    def test_mongo_db_name_from_uri(self):
         self.assertEqual(
-            infisical._normalize_infisical_host("app.infisical.com"),
-            "https://app.infisical.com",
-        )
-        self.assertEqual(
-            infisical._normalize_infisical_host("https://eu.infisical.com/"),
-            "https://eu.infisical.com",
+            infisical._mongo_db_name("mongodb+srv://u:p@cluster.example.net/mqtt?retryWrites=true"),
+            "mqtt",
         )
-
+        self.assertEqual(infisical._mongo_db_name("mongodb://localhost:27017"), "")
+        self.assertEqual(infisical._mongo_db_name("mongodb://localhost:27017/"), "")
+
+    @patch.dict(
+        os.environ,
+        {
+            config.INFISICAL_ENV_HOST: "https://app.infisical.com",
+            config.INFISICAL_ENV_CLIENT_ID: "client_id",
+            config.INFISICAL_ENV_CLIENT_SECRET: "client_secret",
+        },
+    )
     def test_resolve_infisical_settings_prefers_env(self):
-        os.environ[config.INFISICAL_ENV_HOST] = "https://app.infisical.com"
-        os.environ[config.INFISICAL_ENV_CLIENT_ID] = "client_id"
-        os.environ[config.INFISICAL_ENV_CLIENT_SECRET] = "client_secret"
         host, client_id, client_secret = infisical._resolve_infisical_settings()
         self.assertEqual(host, "https://app.infisical.com")
         self.assertEqual(client_id, "client_id")
         self.assertEqual(client_secret, "client_secret")
-        os.environ.pop(config.INFISICAL_ENV_HOST, None)
-        os.environ.pop(config.INFISICAL_ENV_CLIENT_ID, None)
-        os.environ.pop(config.INFISICAL_ENV_CLIENT_SECRET, None)
-
-    def test_build_runner_env_injects_infisical_scope(self):
-        # Stub to avoid depending on local config file.
-        real_resolve_settings = runner._resolve_infisical_settings
-        real_resolve_scope = runner._resolve_infisical_scope
-        try:
-            runner._resolve_infisical_settings = lambda: (
-                "https://eu.infisical.com",
-                "client_id",
-                "client_secret",
-            )
-            runner._resolve_infisical_scope = lambda: (
-                "project_id",
-                "dev",
-                "/",
-            )
-            env = runner._build_runner_env()
-            self.assertEqual(env[config.INFISICAL_ENV_ENABLED], "true")
-            self.assertEqual(env[config.INFISICAL_ENV_HOST], "https://eu.infisical.com")
-            self.assertEqual(env[config.INFISICAL_ENV_CLIENT_ID], "client_id")
-            self.assertNotIn(config.INFISICAL_ENV_CLIENT_SECRET, env)
-            self.assertEqual(env[config.INFISICAL_ENV_PROJECT_ID], "project_id")
-            self.assertEqual(env[config.INFISICAL_ENV_ENVIRONMENT], "dev")
-            self.assertEqual(env[config.INFISICAL_ENV_SECRET_PATH], "/")
-        finally:
-            runner._resolve_infisical_settings = real_resolve_settings
-            runner._resolve_infisical_scope = real_resolve_scope
 
-    def test_build_runner_env_exports_all_when_enabled(self):
+    # Stub to avoid depending on local config file.
+    @patch.object(
+        runner,
+        "_resolve_infisical_settings",
+        return_value=("https://eu.infisical.com", "client_id", "client_secret"),
+    )
+    @patch.object(runner, "_resolve_infisical_scope", return_value=("project_id", "dev", "/"))
+    def test_build_runner_env_injects_infisical_scope(self, _scope, _settings):
+        env = runner._build_runner_env()
+        self.assertEqual(env[config.INFISICAL_ENV_ENABLED], "true")
+        self.assertEqual(env[config.INFISICAL_ENV_HOST], "https://eu.infisical.com")
+        self.assertEqual(env[config.INFISICAL_ENV_CLIENT_ID], "client_id")
+        self.assertNotIn(config.INFISICAL_ENV_CLIENT_SECRET, env)
+        self.assertEqual(env[config.INFISICAL_ENV_PROJECT_ID], "project_id")
+        self.assertEqual(env[config.INFISICAL_ENV_ENVIRONMENT], "dev")
+        self.assertEqual(env[config.INFISICAL_ENV_SECRET_PATH], "/")
+
+    @patch.dict(os.environ, {config.INFISICAL_EXPORT_ALL_ENV: "true"})
+    @patch.object(
+        runner,
+        "_resolve_infisical_settings",
+        return_value=("https://eu.infisical.com", "client_id", "client_secret"),
+    )
+    @patch.object(runner, "_resolve_infisical_scope", return_value=("project_id", "dev", "/"))
+    @patch.object(
+        runner,
+        "_fetch_infisical_env_all",
+        return_value={"BROKER": "broker", "OPENAI_API_KEY": "sk-test"},
+    )
+    @patch.object(runner, "_fetch_infisical_env_exports")
+    def test_build_runner_env_exports_all_when_enabled(self, fetch_subset, *_stubs):
         """
         When INFISICAL_EXPORT_ALL=true, runner should export all secrets (not just defaults).
         """
-        real_resolve_settings = runner._resolve_infisical_settings
-        real_resolve_scope = runner._resolve_infisical_scope
-        real_fetch_all = runner._fetch_infisical_env_all
-        real_fetch_subset = runner._fetch_infisical_env_exports
-        try:
-            os.environ[config.INFISICAL_EXPORT_ALL_ENV] = "true"
-            runner._resolve_infisical_settings = lambda: (
-                "https://eu.infisical.com",
-                "client_id",
-                "client_secret",
-            )
-            runner._resolve_infisical_scope = lambda: (
-                "project_id",
-                "dev",
-                "/",
-            )
-            runner._fetch_infisical_env_all = lambda *_args, **_kwargs: {
-                "BROKER": "broker",
-                "OPENAI_API_KEY": "sk-test",
-            }
-            runner._fetch_infisical_env_exports = lambda *_args, **_kwargs: (_ for _ in ()).throw(
-                AssertionError("_fetch_infisical_env_exports should not be called when export-all is enabled")
-            )
-
-            env = runner._build_runner_env()
-            self.assertEqual(env.get("OPENAI_API_KEY"), "sk-test")
-        finally:
-            os.environ.pop(config.INFISICAL_EXPORT_ALL_ENV, None)
-            runner._resolve_infisical_settings = real_resolve_settings
-            runner._resolve_infisical_scope = real_resolve_scope
-            runner._fetch_infisical_env_all = real_fetch_all
-            runner._fetch_infisical_env_exports = real_fetch_subset
-
+        env = runner._build_runner_env()
+        self.assertEqual(env.get("OPENAI_API_KEY"), "sk-test")
+        fetch_subset.assert_not_called()
+
+    @patch.dict(
+        os.environ,
+        {config.GITHUB_ENV_CLIENT_ID: "gh_id", config.GITHUB_ENV_CLIENT_SECRET: "gh_secret"},
+    )
     def test_resolve_github_oauth_settings_prefers_env(self):
-        os.environ[config.GITHUB_ENV_CLIENT_ID] = "gh_id"
-        os.environ[config.GITHUB_ENV_CLIENT_SECRET] = "gh_secret"
         client_id, client_secret = github._resolve_github_oauth_settings()
         self.assertEqual(client_id, "gh_id")
         self.assertEqual(client_secret, "gh_secret")
-        os.environ.pop(config.GITHUB_ENV_CLIENT_ID, None)
-        os.environ.pop(config.GITHUB_ENV_CLIENT_SECRET, None)
 
-    def test_write_env_key_updates(self):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            path = Path(tmpdir) / ".env"
-            path.write_text("FOO=bar\n# comment\n", encoding="utf-8")
-            workspace._write_env_key(path, "FOO", "baz")
-            workspace._write_env_key(path, "NEW_KEY", "value")
-            content = path.read_text(encoding="utf-8")
-            self.assertIn("FOO=baz", content)
-            self.assertIn("NEW_KEY=value", content)
+    def test_load_config_cache_returns_copies_and_sees_saves(self):
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+                storage, "CONFIG_PATH", Path(tmpdir) / "config.json"
+            ):
+                storage._invalidate_config_cache()
+                storage._save_config({"workspace_root": "/tmp/a"})
+                cfg = storage._load_config()
+                cfg["workspace_root"] = "mutated"
+                self.assertEqual(storage._load_config()["workspace_root"], "/tmp/a")
+                storage._save_config({"workspace_root": "/tmp/b"})
+                self.assertEqual(storage._load_config()["workspace_root"], "/tmp/b")
+        finally:
+            storage._invalidate_config_cache()
 
     def test_setup_noninteractive_flag(self):
         os.environ.pop(config.SETUP_ENV_NONINTERACTIVE, None)
@@ -193,203 +236,201 @@ class TestAccessGuard(unittest.TestCase):
         os.environ[config.SETUP_ENV_NONINTERACTIVE] = "1"
         self.assertTrue(config._setup_noninteractive())
 
+    # Setting a known project ID should not trigger mismatch.
+    @patch.dict(os.environ, {config.INFISICAL_ENV_PROJECT_ID: config.REQUIRED_INFISICAL_PROJECT_ID})
     def test_fetch_infisical_access_requires_project_access(self):
-        # Setting a known project ID should not trigger mismatch.
-        os.environ[config.INFISICAL_ENV_PROJECT_ID] = (
-            config.REQUIRED_INFISICAL_PROJECT_ID
+        fake_urlopen, calls = _routed_urlopen(
+            {
+                _LOGIN_PATH: lambda _url: _FakeResp(_LOGIN_BODY),
+                _SECRETS_PATH: lambda _url: _FakeResp(_SECRETS_EMPTY_BODY),
+            }
         )
-
-        class _FakeResp:
-            def __init__(self, body: str):
-                self._body = body.encode("utf-8")
-
-            def read(self) -> bytes:
-                return self._body
-
-            def __enter__(self):
-                return self
-
-            def __exit__(self, exc_type, exc, tb):
-                return False
-
-        calls = {"login": 0, "secrets": 0}
-        real_urlopen = infisical.urlopen
-
-        def fake_urlopen(req, timeout=0):  # noqa: ANN001 - matches stdlib signature
-            url = getattr(req, "full_url", "")
-            if url.endswith("/api/v1/auth/universal-auth/login"):
-                calls["login"] += 1
-                return _FakeResp('{"accessToken":"token123"}')
-            if "/api/v4/secrets?" in url:
-                calls["secrets"] += 1
-                return _FakeResp('{"secrets":[],"imports":[]}')
-            raise AssertionError(f"Unexpected url: {url}")
-
-        try:
-            infisical.urlopen = fake_urlopen
+        allowed, reason = infisical._fetch_infisical_access(
+            "https://app.infisical.com", "id", "secret", opener=fake_urlopen
+        )
+        self.assertTrue(allowed)
+        self.assertEqual(reason, "")
+        # One login call; one secrets call per known project (may be >1).
+        self.assertEqual(calls[_LOGIN_PATH], 1)
+        self.assertGreaterEqual(calls[_SECRETS_PATH], 1)
+        self.assertEqual(calls[_SECRETS_PATH], len(config.INFISICAL_PROJECT_IDS))
+
+    @patch.dict(os.environ, {config.INFISICAL_ENV_PROJECT_ID: config.REQUIRED_INFISICAL_PROJECT_ID})
+    def test_fetch_infisical_access_denies_when_project_access_fails(self):
+        fake_urlopen, _calls = _routed_urlopen(
+            {
+                _LOGIN_PATH: lambda _url: _FakeResp(_LOGIN_BODY),
+                _SECRETS_PATH: _forbidden,
+            }
+        )
+        # Suppress ResourceWarning from HTTPError cleanup on some Python versions.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=ResourceWarning)
             allowed, reason = infisical._fetch_infisical_access(
-                "https://app.infisical.com", "id", "secret"
+                "https://app.infisical.com", "id", "secret", opener=fake_urlopen
             )
-            self.assertTrue(allowed)
-            self.assertEqual(reason, "")
-            # One login call; one secrets call per known project (may be >1).
-            self.assertEqual(calls["login"], 1)
-            self.assertGreaterEqual(calls["secrets"], 1)
-            self.assertEqual(calls["secrets"], len(config.INFISICAL_PROJECT_IDS))
-        finally:
-            infisical.urlopen = real_urlopen
-            os.environ.pop(config.INFISICAL_ENV_PROJECT_ID, None)
+        self.assertFalse(allowed)
+        self.assertEqual(reason, "http_403")
 
-    def test_fetch_infisical_access_denies_when_project_access_fails(self):
-        os.environ[config.INFISICAL_ENV_PROJECT_ID] = (
-            config.REQUIRED_INFISICAL_PROJECT_ID
+    @patch.dict(os.environ, {config.INFISICAL_ENV_PROJECT_ID: "wrong-project"})
+    def test_fetch_infisical_access_rejects_wrong_project_id_if_configured(self):
+        allowed, reason = infisical._fetch_infisical_access(
+            "https://app.infisical.com", "id", "secret"
         )
+        self.assertFalse(allowed)
+        self.assertEqual(reason, "project_id_mismatch")
+
+    @patch.object(
+        infisical,
+        "_resolve_infisical_settings",
+        return_value=("https://app.infisical.com", "client_id", "client_secret"),
+    )
+    @patch.object(infisical, "_infisical_login", return_value="token123")
+    @patch.object(infisical, "_resolve_infisical_scope", return_value=("project-id", "dev", "/"))
+    def test_check_environment_access_denies_on_http_error(self, *_stubs):
+        """Environment access probe must fail closed on API errors."""
 
-        class _FakeResp:
-            def __init__(self, body: str):
-                self._body = body.encode("utf-8")
-
-            def read(self) -> bytes:
-                return self._body
-
-            def __enter__(self):
-                return self
-
-            def __exit__(self, exc_type, exc, tb):
-                return False
-
-        real_urlopen = infisical.urlopen
-
-        def fake_urlopen(req, timeout=0):  # noqa: ANN001 - matches stdlib signature
-            url = getattr(req, "full_url", "")
-            if url.endswith("/api/v1/auth/universal-auth/login"):
-                return _FakeResp('{"accessToken":"token123"}')
-            if "/api/v4/secrets?" in url:
-                raise HTTPError(url, 403, "Forbidden", hdrs=None, fp=None)
-            raise AssertionError(f"Unexpected url: {url}")
+        fake_urlopen_error, calls = _routed_urlopen({_SECRETS_PATH: _forbidden})
+        with patch.object(infisical, "urlopen", side_effect=fake_urlopen_error):
+            self.assertFalse(infisical._check_environment_access("prod"))
+        self.assertEqual(calls[_SECRETS_PATH], 1)
 
-        try:
-            infisical.urlopen = fake_urlopen
-            # Suppress ResourceWarning from HTTPError cleanup on some Python versions.
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", category=ResourceWarning)
-                allowed, reason = infisical._fetch_infisical_access(
-                    "https://app.infisical.com", "id", "secret"
-                )
-            self.assertFalse(allowed)
-            self.assertEqual(reason, "http_403")
-        finally:
-            infisical.urlopen = real_urlopen
-            os.environ.pop(config.INFISICAL_ENV_PROJECT_ID, None)
+        with patch.object(infisical, "urlopen", return_value=_FakeResp(_SECRETS_EMPTY_BODY)):
+            self.assertTrue(infisical._check_environment_access("prod"))
 
-    def test_fetch_infisical_access_rejects_wrong_project_id_if_configured(self):
-        os.environ[config.INFISICAL_ENV_PROJECT_ID] = "wrong-project"
-        try:
-            allowed, reason = infisical._fetch_infisical_access(
-                "https://app.infisical.com", "id", "secret"
+    @patch.object(
+        access,
+        "_resolve_infisical_scope",
+        return_value=(config.REQUIRED_INFISICAL_PROJECT_ID, "dev", "/"),
+    )
+    @patch.object(access, "_fetch_infisical_access", return_value=(None, "network_error"))
+    def test_access_guard_denies_on_network_error_after_cache_expiry(self, *_stubs):
+        """Core access guard must not allow stale cached grant after TTL expiry."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = Path(tmpdir) / "access-cache.json"
+            access._save_json(
+                cache_path,
+                {
+                    "checked_at": self.now - 999999,
+                    "allowed": True,
+                    "reason": "",
+                    "project_id": config.REQUIRED_INFISICAL_PROJECT_ID,
+                },
             )
-            self.assertFalse(allowed)
-            self.assertEqual(reason, "project_id_mismatch")
-        finally:
-            os.environ.pop(config.INFISICAL_ENV_PROJECT_ID, None)
-
-    def test_check_environment_access_denies_on_http_error(self):
-        """Environment access probe must fail closed on API errors."""
+            with patch.object(access, "_cache_path", return_value=cache_path):
+                with self.assertRaises(SystemExit):
+                    access.ensure_access_or_exit("https://app.infisical.com", "id", "secret")
 
-        class _FakeResp:
-            def read(self) -> bytes:
-                return b'{"secrets":[]}'
+    @patch.object(admin_access, "fetch_access_status", return_value=(None, "network_error", False))
+    def test_admin_access_denies_on_network_error_after_cache_expiry(self, _fetch_status):
+        """Admin access must fail closed after cache expiry when backend is down."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = Path(tmpdir) / "admin-access-cache.json"
+            workspace_path = Path(tmpdir) / "workspace"
+            workspace_path.mkdir(parents=True, exist_ok=True)
+
+            admin_access.save_access_cache(
+                cache_path,
+                {
+                    "access_granted": True,
+                    "checked_at": self.now - 999999,
+                },
+            )
+            env = {
+                admin_access.ACCESS_ENV_URL: "https://example.com/access",
+                admin_access.ACCESS_ENV_CACHE_PATH: str(cache_path),
+            }
+            with patch.dict(os.environ, env):
+                self.assertFalse(admin_access.ensure_access_or_exit(workspace_path))
 
-            def __enter__(self):
-                return self
 
-            def __exit__(self, exc_type, exc, tb):
-                return False
+class TestWorkspaceFiles(unittest.TestCase):
+    """Workspace helpers that touch the filesystem; each test gets a fresh temp dir."""
 
-        real_urlopen = infisical.urlopen
-        real_resolve_settings = infisical._resolve_infisical_settings
-        real_infisical_login = infisical._infisical_login
-        real_resolve_scope = infisical._resolve_infisical_scope
-        try:
-            infisical._resolve_infisical_settings = lambda: (
-                "https://app.infisical.com",
-                "client_id",
-                "client_secret",
-            )
-            infisical._infisical_login = lambda *_args, **_kwargs: "token123"
-            infisical._resolve_infisical_scope = lambda: ("project-id", "dev", "/")
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
 
-            def fake_urlopen_error(req, timeout=0):  # noqa: ANN001
-                url = getattr(req, "full_url", "")
-                raise HTTPError(url, 403, "Forbidden", hdrs=None, fp=None)
+    def tearDown(self):
+        self._tmp.cleanup()
 
-            infisical.urlopen = fake_urlopen_error
-            self.assertFalse(infisical._check_environment_access("prod"))
+    def test_validate_runner_path(self):
+        root = self.tmp
+        runner = root / "run_local_stack.py"
+        runner.write_text("# test")
+        (root / "mqtt_dashboard_watch").mkdir()
+        (root / "dashboard").mkdir()
+        ok, error = workspace._validate_runner_path(runner)
+        self.assertTrue(ok)
+        self.assertEqual(error, "")
 
-            def fake_urlopen_ok(req, timeout=0):  # noqa: ANN001
-                return _FakeResp()
+    def test_validate_runner_path_allows_missing_dashboard_when_unselected(self):
+        root = self.tmp
+        runner = root / "run_local_stack.py"
+        runner.write_text("# test")
+        (root / "mqtt_dashboard_watch").mkdir()
+        ok, error = workspace._validate_runner_path(
+            runner, config_override={"install_dashboard": False}
+        )
+        self.assertTrue(ok)
+        self.assertEqual(error, "")
 
-            infisical.urlopen = fake_urlopen_ok
-            self.assertTrue(infisical._check_environment_access("prod"))
-        finally:
-            infisical.urlopen = real_urlopen
-            infisical._resolve_infisical_settings = real_resolve_settings
-            infisical._infisical_login = real_infisical_login
-            infisical._resolve_infisical_scope = real_resolve_scope
+    def test_validate_runner_path_allows_missing_mqtt_when_unselected(self):
+        root = self.tmp
+        runner = root / "run_local_stack.py"
+        runner.write_text("# test")
+        (root / "dashboard").mkdir()
+        ok, error = workspace._validate_runner_path(
+            runner, config_override={"install_mqtt": False, "install_dashboard": True}
+        )
+        self.assertTrue(ok)
+        self.assertEqual(error, "")
 
-    def test_access_guard_denies_on_network_error_after_cache_expiry(self):
-        """Core access guard must not allow stale cached grant after TTL expiry."""
-        real_cache_path = access._cache_path
-        real_resolve_scope = access._resolve_infisical_scope
-        real_fetch_access = access._fetch_infisical_access
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                cache_path = Path(tmpdir) / "access-cache.json"
-                access._cache_path = lambda: cache_path
-                access._resolve_infisical_scope = lambda: (config.REQUIRED_INFISICAL_PROJECT_ID, "dev", "/")
-                access._fetch_infisical_access = lambda *_args, **_kwargs: (None, "network_error")
-                access._save_json(
-                    cache_path,
-                    {
-                        "checked_at": time.time() - 999999,
-                        "allowed": True,
-                        "reason": "",
-                        "project_id": config.REQUIRED_INFISICAL_PROJECT_ID,
-                    },
-                )
-                with self.assertRaises(SystemExit):
-                    access.ensure_access_or_exit("https://app.infisical.com", "id", "secret")
-        finally:
-            access._cache_path = real_cache_path
-            access._resolve_infisical_scope = real_resolve_scope
-            access._fetch_infisical_access = real_fetch_access
+    def test_validate_runner_path_requires_selection_when_none(self):
+        root = self.tmp
+        runner = root / "run_local_stack.py"
+        runner.write_text("# test")
+        ok, error = workspace._validate_runner_path(
+            runner,
+            config_override={"install_mqtt": False, "install_dashboard": False},
+        )
+        self.assertFalse(ok)
+        self.assertEqual(error, "No repositories selected for installation.")
+
+    def test_validate_runner_path_uses_snapshot(self):
+        root = self.tmp
+        runner = root / "run_local_stack.py"
+        runner.write_text("# test")
+        (root / "mqtt_dashboard_watch").mkdir()
+        snapshot = workspace._snapshot_workspace(root)
+        self.assertIn("mqtt_dashboard_watch", snapshot)
+        # Later filesystem changes are not seen; the snapshot is the source of truth.
+        runner.unlink()
+        ok, error = workspace._validate_runner_path(
+            runner, config_override={}, snapshot=snapshot
+        )
+        self.assertTrue(ok)
+        self.assertEqual(error, "")
+        self.assertEqual(workspace._snapshot_workspace(root / "missing"), {})
 
-    def test_admin_access_denies_on_network_error_after_cache_expiry(self):
-        """Admin access must fail closed after cache expiry when backend is down."""
-        admin_access = __import__("moovent_stack.admin.access", fromlist=[""])
-        real_fetch_status = admin_access.fetch_access_status
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                cache_path = Path(tmpdir) / "admin-access-cache.json"
-                workspace_path = Path(tmpdir) / "workspace"
-                workspace_path.mkdir(parents=True, exist_ok=True)
-
-                os.environ[admin_access.ACCESS_ENV_URL] = "https://example.com/access"
-                os.environ[admin_access.ACCESS_ENV_CACHE_PATH] = str(cache_path)
-
-                admin_access.save_access_cache(
-                    cache_path,
-                    {
-                        "access_granted": True,
-                        "checked_at": time.time() - 999999,
-                    },
-                )
-                admin_access.fetch_access_status = lambda *_args, **_kwargs: (None, "network_error", False)
-                self.assertFalse(admin_access.ensure_access_or_exit(workspace_path))
-        finally:
-            os.environ.pop(admin_access.ACCESS_ENV_URL, None)
-            os.environ.pop(admin_access.ACCESS_ENV_CACHE_PATH, None)
-            admin_access.fetch_access_status = real_fetch_status
+    def test_write_env_key_updates(self):
+        path = self.tmp / ".env"
+        path.write_text("FOO=bar\n# comment\n", encoding="utf-8")
+        workspace._write_env_key(path, "FOO", "baz")
+        workspace._write_env_key(path, "NEW_KEY", "value")
+        content = path.read_text(encoding="utf-8")
+        self.assertIn("FOO=baz", content)
+        self.assertIn("NEW_KEY=value", content)
+
+    def test_write_env_keys_batch_preserves_comments(self):
+        path = self.tmp / ".env"
+        path.write_text("# header\n# B=old\nA=1\n B = 2\n", encoding="utf-8")
+        workspace._write_env_keys(path, {"B": "20", "C": "30"})
+        self.assertEqual(
+            path.read_text(encoding="utf-8"), "# header\n# B=old\nA=1\nB=20\nC=30\n"
+        )
+        self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+        self.assertEqual(sorted(p.name for p in self.tmp.iterdir()), [".env"])
 
 
 if __name__ == "__main__":
@@ -5,18 +5,35 @@ Goals:
 - Reinstall Node deps when lockfile fingerprint changes.
 - Skip Node reinstall when fingerprint matches and install is healthy.
 - Reinstall Python deps when requirements fingerprint changes.
+- Reuse the marker digest (no hashing) while the lockfile stat is unchanged.
+- Ignore lockfile reformatting (canonical JSON fingerprint).
+- Write markers atomically and serve just-written markers from memory.
+- Restore node_modules from the lockfile cache instead of re-running `npm ci`.
+- Never "repair" a corrupted install from the (hard-linked, equally corrupted) cache.
 """
 
 from __future__ import annotations
 
+import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 from moovent_stack.admin import deps
 
+from _tmpfs import setUpModule, tearDownModule  # noqa: F401
+
 
 class TestAdminDeps(unittest.TestCase):
+    def setUp(self) -> None:
+        # Keep the node_modules cache inside the test's temp area, never ~/.cache.
+        cache_home = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_home.cleanup)
+        env = patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home.name})
+        env.start()
+        self.addCleanup(env.stop)
+
     def test_node_reinstalls_when_lock_fingerprint_changes(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
             project = Path(tmpdir) / "client"
@@ -27,15 +44,10 @@ class TestAdminDeps(unittest.TestCase):
             (project / ".deps_installed").write_text("lock:old\n", encoding="utf-8")
 
             calls: list[list[str]] = []
-            real_run_cmd = deps.run_cmd
-            real_vite_healthy = deps._vite_is_healthy
-            try:
-                deps.run_cmd = lambda cmd, cwd, env=None: calls.append(cmd)  # type: ignore[assignment]
-                deps._vite_is_healthy = lambda _node_modules: True  # type: ignore[assignment]
+            with patch.object(
+                deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append(cmd)
+            ), patch.object(deps, "_vite_is_healthy", return_value=True):
                 deps.ensure_node_deps(project)
-            finally:
-                deps.run_cmd = real_run_cmd  # type: ignore[assignment]
-                deps._vite_is_healthy = real_vite_healthy  # type: ignore[assignment]
 
             self.assertEqual(len(calls), 1)
             self.assertEqual(calls[0][:2], ["npm", "ci"])
@@ -51,21 +63,121 @@ class TestAdminDeps(unittest.TestCase):
             lock = project / "package-lock.json"
             lock.write_text('{"lockfileVersion":3}\n', encoding="utf-8")
             (project / "node_modules").mkdir(parents=True, exist_ok=True)
-            fp = f"lock:{deps._file_sha256(lock)}"
+            fp = f"lock:{deps._lock_canonical_hash(lock)}"
             (project / ".deps_installed").write_text(f"{fp}\n", encoding="utf-8")
 
             calls: list[list[str]] = []
-            real_run_cmd = deps.run_cmd
-            real_vite_healthy = deps._vite_is_healthy
-            try:
-                deps.run_cmd = lambda cmd, cwd, env=None: calls.append(cmd)  # type: ignore[assignment]
-                deps._vite_is_healthy = lambda _node_modules: True  # type: ignore[assignment]
+            with patch.object(
+                deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append(cmd)
+            ), patch.object(deps, "_vite_is_healthy", return_value=True):
+                deps.ensure_node_deps(project)
+
+            self.assertEqual(calls, [])
+
+    def test_node_marker_stat_match_skips_hashing_and_legacy_marker_upgrades(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            project = Path(tmpdir) / "client"
+            project.mkdir(parents=True, exist_ok=True)
+            (project / "package.json").write_text('{"name":"client"}\n', encoding="utf-8")
+            lock = project / "package-lock.json"
+            lock.write_text('{"lockfileVersion":3}\n', encoding="utf-8")
+            os.utime(lock, ns=(1_000_000_000, 1_000_000_000))  # Outside the racy window.
+            (project / "node_modules").mkdir(parents=True, exist_ok=True)
+            marker = project / ".deps_installed"
+            marker.write_text(f"lock:{deps._lock_canonical_hash(lock)}\n", encoding="utf-8")
+
+            calls: list[list[str]] = []
+            with patch.object(deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append(cmd)):
+                # Legacy `lock:<digest>` marker: same content, rewritten with stat fields.
                 deps.ensure_node_deps(project)
-            finally:
-                deps.run_cmd = real_run_cmd  # type: ignore[assignment]
-                deps._vite_is_healthy = real_vite_healthy  # type: ignore[assignment]
+                upgraded = marker.read_text(encoding="utf-8").strip()
+                self.assertEqual(upgraded, f"lock:1000000000:{lock.stat().st_size}:{deps._lock_canonical_hash(lock)}")
+
+                # Stat unchanged: the digest is reused without hashing the lockfile.
+                with patch.object(deps, "_lock_canonical_hash", side_effect=AssertionError("lockfile was hashed")):
+                    deps.ensure_node_deps(project)
 
             self.assertEqual(calls, [])
+            self.assertEqual(marker.read_text(encoding="utf-8").strip(), upgraded)
+
+    def test_lock_fingerprint_ignores_json_formatting(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lock = Path(tmpdir) / "package-lock.json"
+            lock.write_text('{"lockfileVersion":3,"name":"client"}\n', encoding="utf-8")
+            compact = deps._lock_canonical_hash(lock)
+
+            lock.write_text('{\r\n  "name": "client",\r\n  "lockfileVersion": 3\r\n}\r\n', encoding="utf-8")
+            self.assertEqual(deps._lock_canonical_hash(lock), compact)
+
+            lock.write_text('{"lockfileVersion":3,"name":"server"}\n', encoding="utf-8")
+            self.assertNotEqual(deps._lock_canonical_hash(lock), compact)
+
+            lock.write_text("{not json", encoding="utf-8")
+            self.assertEqual(deps._lock_canonical_hash(lock), deps._file_fingerprint(lock))
+
+    def test_node_modules_restored_from_cache_for_known_lockfile(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            projects = [Path(tmpdir) / "a", Path(tmpdir) / "b"]
+            for project in projects:
+                project.mkdir()
+                (project / "package.json").write_text('{"name":"client"}\n', encoding="utf-8")
+                (project / "package-lock.json").write_text('{"lockfileVersion":3}\n', encoding="utf-8")
+
+            def fake_npm(cmd: list[str], cwd: Path, env: object = None) -> None:  # noqa: ARG001
+                calls.append(cmd)
+                (cwd / "node_modules" / "dep").mkdir(parents=True)
+                (cwd / "node_modules" / "dep" / "index.js").write_text("module.exports = 1\n", encoding="utf-8")
+                (cwd / "node_modules" / ".vite").mkdir()
+
+            calls: list[list[str]] = []
+            with patch.dict(os.environ, {"MOOVENT_NODE_MODULES_CACHE": "1"}), patch.object(
+                deps, "run_cmd", side_effect=fake_npm
+            ), patch.object(deps, "_node_abi", return_value="1"):
+                deps.ensure_node_deps(projects[0])
+                deps.ensure_node_deps(projects[1])
+
+            self.assertEqual(calls, [["npm", "ci", "--no-audit", "--no-fund"]])
+            restored = projects[1] / "node_modules"
+            self.assertEqual((restored / "dep" / "index.js").read_text(encoding="utf-8"), "module.exports = 1\n")
+            self.assertFalse((restored / ".vite").exists())
+            self.assertTrue((projects[1] / ".deps_installed").read_text(encoding="utf-8").startswith("lock:"))
+
+    def test_corrupted_node_modules_cache_is_evicted_not_restored(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            projects = [Path(tmpdir) / "a", Path(tmpdir) / "b"]
+            for project in projects:
+                project.mkdir()
+                (project / "package.json").write_text('{"name":"client"}\n', encoding="utf-8")
+                (project / "package-lock.json").write_text('{"lockfileVersion":3}\n', encoding="utf-8")
+
+            def fake_npm(cmd: list[str], cwd: Path, env: object = None) -> None:  # noqa: ARG001
+                calls.append(cwd)
+                node = cwd / "node_modules" / "vite" / "dist" / "node"
+                (node / "chunks").mkdir(parents=True)
+                (node / "chunks" / "dep-ok.js").write_text("\n", encoding="utf-8")
+                (node / "cli.js").write_text("import './chunks/dep-ok.js'\n", encoding="utf-8")
+
+            calls: list[Path] = []
+            with patch.dict(os.environ, {"MOOVENT_NODE_MODULES_CACHE": "1"}), patch.object(
+                deps, "run_cmd", side_effect=fake_npm
+            ), patch.object(deps, "_node_abi", return_value="1"):
+                deps.ensure_node_deps(projects[0])
+                # In-place write: hard links make the cache entry see it too.
+                cli = projects[0] / "node_modules" / "vite" / "dist" / "node" / "cli.js"
+                with open(cli, "w", encoding="utf-8") as f:
+                    f.write("import './chunks/dep-missing.js'\n")
+
+                # Restored from the corrupted cache: health re-checked, npm ci runs.
+                deps.ensure_node_deps(projects[1])
+                self.assertEqual(calls, [projects[0], projects[1]])
+                self.assertTrue(deps._vite_is_healthy(projects[1] / "node_modules"))
+
+                # Unhealthy install on the marker-match path: cache skipped, npm ci runs.
+                with open(cli, "w", encoding="utf-8") as f:
+                    f.write("import './chunks/dep-missing.js'\n")
+                deps.ensure_node_deps(projects[0])
+                self.assertEqual(calls, [projects[0], projects[1], projects[0]])
+                self.assertTrue(deps._vite_is_healthy(projects[0] / "node_modules"))
 
     def test_python_reinstalls_when_requirements_change(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -80,17 +192,59 @@ class TestAdminDeps(unittest.TestCase):
             marker.write_text("req:old\n", encoding="utf-8")
 
             calls: list[list[str]] = []
-            real_run_cmd = deps.run_cmd
-            try:
-                deps.run_cmd = lambda cmd, cwd, env=None: calls.append(cmd)  # type: ignore[assignment]
+            with patch.object(deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append(cmd)):
                 py = deps.ensure_python_deps(repo, "python3")
-            finally:
-                deps.run_cmd = real_run_cmd  # type: ignore[assignment]
 
             self.assertEqual(py, str(venv_python))
             self.assertEqual(len(calls), 1)
             self.assertEqual(calls[0][:4], [str(venv_python), "-m", "pip", "install"])
             self.assertTrue(marker.read_text(encoding="utf-8").strip().startswith("req:"))
+            self.assertEqual([p.name for p in marker.parent.iterdir() if p.name.endswith(".tmp")], [])
+
+            # The marker just written is served from memory, not re-read.
+            written = marker.read_text(encoding="utf-8").strip()
+            with patch.object(Path, "read_text", side_effect=AssertionError("marker was re-read")):
+                self.assertEqual(deps._read_marker(marker), written)
+
+    def test_python_skips_install_when_requirements_unchanged(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            repo = Path(tmpdir) / "mqtt_dashboard_watch"
+            repo.mkdir(parents=True, exist_ok=True)
+            (repo / "requirements.txt").write_text("requests==2.0.0\n", encoding="utf-8")
+            venv_python = repo / ".venv" / "bin" / "python"
+            venv_python.parent.mkdir(parents=True, exist_ok=True)
+            venv_python.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
+            marker = repo / ".venv" / ".deps_installed"
+            marker.write_text(f"{deps._python_dep_fingerprint(repo)}\n", encoding="utf-8")
+
+            calls: list[list[str]] = []
+            with patch.object(deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append(cmd)):
+                deps.ensure_python_deps(repo, "python3")
+
+            self.assertEqual(calls, [])
+
+    def test_ensure_all_deps_installs_serially_in_order(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            repo = Path(tmpdir) / "mqtt_dashboard_watch"
+            (repo / ".venv" / "bin").mkdir(parents=True, exist_ok=True)
+            (repo / "requirements.txt").write_text("requests==2.0.0\n", encoding="utf-8")
+            venv_python = repo / ".venv" / "bin" / "python"
+            venv_python.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
+            projects = [Path(tmpdir) / "server", Path(tmpdir) / "client"]
+            for project in projects:
+                project.mkdir()
+                (project / "package.json").write_text('{"name":"x"}\n', encoding="utf-8")
+
+            calls: list[tuple[list[str], Path]] = []
+            with patch.object(deps, "run_cmd", side_effect=lambda cmd, cwd, env=None: calls.append((cmd, cwd))):
+                py = deps.ensure_all_deps(projects, repo, "python3")
+
+            self.assertEqual(py, str(venv_python))
+            self.assertEqual([cwd for _cmd, cwd in calls], [repo, *projects])
+            self.assertEqual(calls[1][0][:2], ["npm", "install"])
+            for project in projects:
+                marker = (project / ".deps_installed").read_text(encoding="utf-8")
+                self.assertTrue(marker.startswith("pkg:"))
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ Goals:
 - Validate fast-forward update endpoint logic (git pull --ff-only) via `git_pull_latest`.
 
 Notes:
-- These tests use the system `git` binary and temporary repositories.
+- These tests use the system `git` binary (and `sh` for multi-step setup) and temporary repositories.
 - They do not touch the user's real repos.
 """
 
@@ -14,6 +14,7 @@ from __future__ import annotations
 
 import subprocess
 import tempfile
+import textwrap
 import unittest
 from pathlib import Path
 
@@ -24,17 +25,30 @@ from moovent_stack.admin.git_ops import (
     github_commit_url,
 )
 
+from _tmpfs import setUpModule, tearDownModule  # noqa: F401
+
 
 def _git(cwd: Path, *args: str) -> str:
     """Run git in `cwd` and return stdout (raises on error)."""
     proc = subprocess.run(
         ["git", *args],
         cwd=str(cwd),
-        capture_output=True,
-        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return proc.stdout.decode("utf-8", errors="replace").strip()
+
+
+def _git_script(cwd: Path, script: str) -> None:
+    """Run a multi-step git setup as one `sh` process (stops at the first failure)."""
+    subprocess.run(
+        ["sh", "-c", "set -e\n" + textwrap.dedent(script)],
+        cwd=str(cwd),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
         check=True,
     )
-    return (proc.stdout or "").strip()
 
 
 class TestAdminGitOps(unittest.TestCase):
@@ -54,40 +68,43 @@ class TestAdminGitOps(unittest.TestCase):
     def test_collect_git_info_and_pull_latest(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
             root = Path(tmpdir)
-            bare = root / "remote.git"
-            upstream = root / "upstream"
             local = root / "local"
 
-            bare.mkdir(parents=True, exist_ok=True)
-            _git(bare, "init", "--bare")
-
-            # Upstream repo: create initial commit and push.
-            upstream.mkdir(parents=True, exist_ok=True)
-            _git(upstream, "init")
-            _git(upstream, "config", "user.email", "test@example.com")
-            _git(upstream, "config", "user.name", "Test")
-            (upstream / "README.txt").write_text("v1\n", encoding="utf-8")
-            _git(upstream, "add", "README.txt")
-            _git(upstream, "commit", "-m", "init")
-            _git(upstream, "branch", "-M", "main")
-            _git(upstream, "remote", "add", "origin", str(bare))
-            _git(upstream, "push", "-u", "origin", "main")
-
-            # Clone into local repo.
-            _git(root, "clone", str(bare), str(local))
-
-            # Add another commit upstream and push, making local behind.
-            (upstream / "README.txt").write_text("v2\n", encoding="utf-8")
-            _git(upstream, "add", "README.txt")
-            _git(upstream, "commit", "-m", "second")
-            upstream_sha = _git(upstream, "rev-parse", "HEAD")
-            _git(upstream, "push")
+            # Bare remote, upstream repo pushing "init", local clone, then a
+            # second upstream commit so local is behind.
+            _git_script(
+                root,
+                """
+                git init -q --bare remote.git
+                git init -q upstream
+                cd upstream
+                git config user.email test@example.com
+                git config user.name Test
+                printf 'v1\\n' > README.txt
+                git add README.txt
+                git commit -q -m init
+                git branch -M main
+                git remote add origin ../remote.git
+                git push -q -u origin main
+                cd ..
+                git clone -q remote.git local
+                cd upstream
+                printf 'v2\\n' > README.txt
+                git commit -q -am second
+                git push -q
+                """,
+            )
+            upstream_sha = _git(root / "upstream", "rev-parse", "HEAD")
 
             info = collect_git_info(local, fetch=True)
             self.assertTrue(info.get("is_git"))
             self.assertEqual(info.get("branch"), "main")
             self.assertGreaterEqual(int(info.get("behind") or 0), 1)
             self.assertEqual(info.get("upstream_commit"), upstream_sha)
+            self.assertEqual(info.get("upstream_subject"), "second")
+            self.assertEqual(info.get("branches_local"), ["main"])
+            self.assertEqual(info.get("branches_remote"), ["main"])
+            self.assertFalse(info.get("dirty"))
             self.assertTrue(bool(info.get("can_update_latest")))
 
             ok, code, _detail = git_pull_latest(local)
@@ -4,12 +4,21 @@ Unit tests for admin service startup behavior.
 Goals:
 - Auto-free stale listeners from previous stack runs on service start.
 - Avoid killing unrelated listeners that do not belong to the service repo.
+- Terminate a live PID promptly via SIGTERM.
+- Resolve listener PIDs from /proc on Linux.
 """
 
 from __future__ import annotations
 
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 from moovent_stack.admin import services
 from moovent_stack.admin.logs import LogStore
@@ -42,29 +51,23 @@ class TestAdminServices(unittest.TestCase):
         manager.register(spec)
 
         calls = {"terminate": []}
-        real_tcp = services.tcp_listen_pids
-        real_cmd = services.pid_command
-        real_term = services.terminate_pid
-        real_popen = services._popen
-        try:
-            seq = [[11111], []]
-
-            def fake_tcp_listen_pids(_port: int, ttl_s: float = 2.0) -> list[int]:  # noqa: ARG001
-                return seq.pop(0) if seq else []
-
-            services.tcp_listen_pids = fake_tcp_listen_pids  # type: ignore[assignment]
-            services.pid_command = lambda _pid: f"node {spec.cwd}/node_modules/.bin/vite --port 4000"  # type: ignore[assignment]
-            services.terminate_pid = lambda pid, timeout_s=2.0: (calls["terminate"].append(pid) or True, "terminated")  # type: ignore[assignment]
-            services._popen = lambda cmd, cwd, env: _FakeProc(22222)  # type: ignore[assignment]
-
+        seq = [[11111], []]
+
+        def fake_tcp_listen_pids(_port: int, ttl_s: float = 2.0) -> list[int]:  # noqa: ARG001
+            return seq.pop(0) if seq else []
+
+        with patch.object(services, "tcp_listen_pids", side_effect=fake_tcp_listen_pids), patch.object(
+            services,
+            "pid_commands",
+            side_effect=lambda pids: {pid: f"node {spec.cwd}/node_modules/.bin/vite --port 4000" for pid in pids},
+        ), patch.object(
+            services,
+            "terminate_pid",
+            side_effect=lambda pid, timeout_s=2.0: (calls["terminate"].append(pid) or True, "terminated"),
+        ), patch.object(services, "_popen", return_value=_FakeProc(22222)):
             ok = manager.start("frontend")
             self.assertTrue(ok)
             self.assertEqual(calls["terminate"], [11111])
-        finally:
-            services.tcp_listen_pids = real_tcp  # type: ignore[assignment]
-            services.pid_command = real_cmd  # type: ignore[assignment]
-            services.terminate_pid = real_term  # type: ignore[assignment]
-            services._popen = real_popen  # type: ignore[assignment]
 
     def test_start_does_not_kill_unrelated_listener(self) -> None:
         log_store = LogStore(max_entries=50)
@@ -82,24 +85,99 @@ class TestAdminServices(unittest.TestCase):
         manager.register(spec)
 
         calls = {"terminate": []}
-        real_tcp = services.tcp_listen_pids
-        real_cmd = services.pid_command
-        real_term = services.terminate_pid
-        real_popen = services._popen
-        try:
-            services.tcp_listen_pids = lambda _port, ttl_s=2.0: [33333]  # type: ignore[assignment]
-            services.pid_command = lambda _pid: "python -m http.server 4000"  # type: ignore[assignment]
-            services.terminate_pid = lambda pid, timeout_s=2.0: (calls["terminate"].append(pid) or True, "terminated")  # type: ignore[assignment]
-            services._popen = lambda cmd, cwd, env: _FakeProc(44444)  # type: ignore[assignment]
-
+        with patch.object(services, "tcp_listen_pids", return_value=[33333]), patch.object(
+            services, "pid_commands", side_effect=lambda pids: {pid: "python -m http.server 4000" for pid in pids}
+        ), patch.object(
+            services,
+            "terminate_pid",
+            side_effect=lambda pid, timeout_s=2.0: (calls["terminate"].append(pid) or True, "terminated"),
+        ), patch.object(services, "_popen", return_value=_FakeProc(44444)):
             ok = manager.start("frontend")
             self.assertFalse(ok)
             self.assertEqual(calls["terminate"], [])
+
+    def test_unexpected_exit_recorded_by_waiter_thread(self) -> None:
+        log_store = LogStore(max_entries=50)
+        manager = StackManager(log_store=log_store, quiet=True)
+        manager.register(
+            ServiceSpec(
+                name="crasher",
+                cmd=[sys.executable, "-c", "import sys; sys.exit(3)"],
+                cwd=Path.cwd(),
+                env=dict(os.environ),
+                url="",
+                health_url="",
+                port=0,
+            )
+        )
+        # The log stream never reads stdout (so never sees EOF): only the
+        # waiter thread can record the exit.
+        with patch.object(StackManager, "_stream_proc", lambda self, name, proc: None):
+            try:
+                self.assertTrue(manager.start("crasher"))
+                deadline = time.time() + 10.0
+                while "crasher" not in manager.last_exit_codes and time.time() < deadline:
+                    time.sleep(0.02)
+                self.assertEqual(manager.last_exit_codes.get("crasher"), 3)
+            finally:
+                manager.stop_all()
+
+    def test_exit_recorded_while_grandchild_holds_stdout(self) -> None:
+        log_store = LogStore(max_entries=50)
+        manager = StackManager(log_store=log_store, quiet=True)
+        # The grandchild inherits stdout and outlives its parent, so the log
+        # stream does not reach EOF when the service process exits.
+        script = (
+            "import subprocess, sys, time; "
+            "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); "
+            "print(p.pid, flush=True); time.sleep(0.2); sys.exit(3)"
+        )
+        manager.register(
+            ServiceSpec(
+                name="forker",
+                cmd=[sys.executable, "-c", script],
+                cwd=Path.cwd(),
+                env=dict(os.environ),
+                url="",
+                health_url="",
+                port=0,
+            )
+        )
+        try:
+            self.assertTrue(manager.start("forker"))
+            deadline = time.time() + 10.0
+            while "forker" not in manager.last_exit_codes and time.time() < deadline:
+                time.sleep(0.02)
+            self.assertEqual(manager.last_exit_codes.get("forker"), 3)
+        finally:
+            manager.stop_all()
+            for entry in log_store.tail("forker", 50):
+                if entry.line.isdigit():
+                    services.terminate_pid(int(entry.line), timeout_s=1.0)
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX signals only")
+    def test_terminate_pid_returns_once_process_exits(self) -> None:
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        # Reap concurrently, as a stale listener from another run would be.
+        threading.Thread(target=proc.wait, daemon=True).start()
+        try:
+            started = time.monotonic()
+            ok, detail = services.terminate_pid(proc.pid, timeout_s=5.0)
+            self.assertTrue(ok)
+            self.assertEqual(detail, "terminated")
+            self.assertLess(time.monotonic() - started, 5.0)
         finally:
-            services.tcp_listen_pids = real_tcp  # type: ignore[assignment]
-            services.pid_command = real_cmd  # type: ignore[assignment]
-            services.terminate_pid = real_term  # type: ignore[assignment]
-            services._popen = real_popen  # type: ignore[assignment]
+            if proc.poll() is None:
+                proc.kill()
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "/proc listener lookup is Linux-only")
+    def test_tcp_listen_pids_reads_proc_on_linux(self) -> None:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            sock.listen(1)
+            port = sock.getsockname()[1]
+            self.assertIn(os.getpid(), services.tcp_listen_pids(port))
+        self.assertNotIn(os.getpid(), services.tcp_listen_pids(port))
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ Goals:
 
 from __future__ import annotations
 
+import os
 import tempfile
 import time
 import unittest
@@ -16,6 +17,8 @@ from pathlib import Path
 
 from moovent_stack.admin.watchdog import ServiceWatchdog, WatchEvent, WatchRule
 
+from _tmpfs import setUpModule, tearDownModule  # noqa: F401
+
 
 class TestAdminWatchdog(unittest.TestCase):
     def test_no_event_without_change(self) -> None:
@@ -95,6 +98,120 @@ class TestAdminWatchdog(unittest.TestCase):
             self.assertEqual(len(later), 1)
             self.assertEqual(later[0], WatchEvent("svc-c", "python_reinstall_restart", "python deps changed"))
 
+    def test_dependency_dirs_are_not_watched(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src" / "pkg").mkdir(parents=True)
+            (root / "node_modules" / "dep").mkdir(parents=True)
+            source = root / "src" / "pkg" / "mod.py"
+            source.write_text("x = 1\n", encoding="utf-8")
+            vendored = root / "node_modules" / "dep" / "package.json"
+            vendored.write_text("{}\n", encoding="utf-8")
+
+            wd = ServiceWatchdog(
+                [
+                    WatchRule(
+                        service="svc-d",
+                        root=root,
+                        globs=["src/**/*.py", "package.json"],
+                        action="restart",
+                        debounce_s=0.0,
+                        reason="code changed",
+                    )
+                ]
+            )
+            wd.prime()
+            time.sleep(0.01)
+            vendored.write_text("{\"v\": 2}\n", encoding="utf-8")
+            self.assertEqual(wd.poll(now=time.time()), [])
+
+            source.write_text("x = 2\n", encoding="utf-8")
+            self.assertEqual(len(wd.poll(now=time.time())), 1)
+
+    def test_new_matching_file_detected_unrelated_file_ignored(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "src" / "a.py").write_text("a = 1\n", encoding="utf-8")
+
+            wd = ServiceWatchdog(
+                [
+                    WatchRule(
+                        service="svc-e",
+                        root=root,
+                        globs=["src/**/*.py"],
+                        action="restart",
+                        debounce_s=0.0,
+                        reason="code changed",
+                    )
+                ]
+            )
+            # Dir mtimes well outside the racy window, so only a real mtime change rescans.
+            for path in (root, root / "src"):
+                os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+            wd.prime()
+            (root / "src" / "notes.txt").write_text("x\n", encoding="utf-8")
+            self.assertEqual(wd.poll(now=time.time()), [])
+
+            (root / "src" / "b.py").write_text("b = 1\n", encoding="utf-8")
+            self.assertEqual(len(wd.poll(now=time.time())), 1)
+            self.assertEqual(wd.poll(now=time.time()), [])
+
+    def test_new_file_detected_when_racy_dir_mtime_does_not_move(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "src").mkdir()
+            (root / "src" / "a.py").write_text("a = 1\n", encoding="utf-8")
+
+            wd = ServiceWatchdog(
+                [
+                    WatchRule(
+                        service="svc-g",
+                        root=root,
+                        globs=["src/**/*.py"],
+                        action="restart",
+                        debounce_s=0.0,
+                        reason="code changed",
+                    )
+                ]
+            )
+            wd.prime()
+            primed_ns = {path: path.stat().st_mtime_ns for path in (root, root / "src")}
+            (root / "src" / "b.py").write_text("b = 1\n", encoding="utf-8")
+            # Simulate coarse mtime granularity: the add lands in the primed tick.
+            for path, mtime_ns in primed_ns.items():
+                os.utime(path, ns=(mtime_ns, mtime_ns))
+            self.assertEqual(len(wd.poll(now=time.time())), 1)
+
+    def test_edits_during_debounce_fold_into_one_event(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            file_path = root / ".env"
+            file_path.write_text("A=1\n", encoding="utf-8")
+            os.utime(file_path, ns=(1_000_000_000, 1_000_000_000))
+
+            wd = ServiceWatchdog(
+                [
+                    WatchRule(
+                        service="svc-f",
+                        root=root,
+                        globs=[".env"],
+                        action="restart",
+                        debounce_s=1.0,
+                        reason="env changed",
+                    )
+                ]
+            )
+            wd.prime()
+            t0 = time.time()
+            os.utime(file_path, ns=(2_000_000_000, 2_000_000_000))
+            self.assertEqual(wd.poll(now=t0), [])
+
+            os.utime(file_path, ns=(3_000_000_000, 3_000_000_000))
+            self.assertEqual(wd.poll(now=t0 + 0.5), [])
+            self.assertEqual(len(wd.poll(now=t0 + 1.1)), 1)
+            self.assertEqual(wd.poll(now=t0 + 1.2), [])
+
 
 if __name__ == "__main__":
     raise SystemExit(unittest.main())